@@ -1,17 +1,13 @@
 from fastapi import FastAPI
-from .services.weather_service import WeatherService
 from .utils.middleware import auth_backend
-from .services.prediction_service import PredictionService
 from fastapi_users import FastAPIUsers
 from .manager.usermanager import get_user_manager
-from .routers import app_routes
+from .routers import app_routes, weather_service, prediction_service, training_jobs
 from .schemas.users import UserCreate, UserRead, UserUpdate
 from .models.database import User
 from .utils.database import init_db
 
 app = FastAPI(title="Network Outage Forecaster")
-weather_service = WeatherService()
-prediction_service = PredictionService()
 
 
 fastapi_users = FastAPIUsers[User, int](
@@ -40,3 +36,12 @@ app.include_router(
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    # Serve the newest stored model from the first request
+    prediction_service.load_artifact()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    training_jobs.shutdown()
+    prediction_service.stop_shadow()
+    await weather_service.aclose()
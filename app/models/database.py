@@ -1,6 +1,6 @@
 from sqlalchemy import (
     create_engine, Column, Integer, Float,
-    String, DateTime, Boolean, ForeignKey)
+    String, DateTime, Boolean, ForeignKey, Index)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from fastapi_users import models
@@ -23,6 +23,27 @@ class WeatherRecord(TimestampedModel):
     cloud = Column(Integer)
 
 
+class WeatherFeatures(TimestampedModel):
+    """Rolling-window aggregates materialized for each weather record"""
+    __tablename__ = "weather_features"
+    weather_record_id = Column(Integer, ForeignKey('weather_records.id'), unique=True)
+    location_key = Column(String)
+    timestamp = Column(DateTime)
+    # Raw inputs kept here so window queries only touch this table
+    wind_speed = Column(Float)
+    humidity = Column(Float)
+    rain_amount = Column(Float)
+    max_wind_6h = Column(Float)
+    max_wind_24h = Column(Float)
+    rain_6h = Column(Float)
+    rain_24h = Column(Float)
+    humidity_trend_6h = Column(Float)
+
+    __table_args__ = (
+        Index('ix_weather_features_location_time', 'location_key', 'timestamp'),
+    )
+
+
 class School(TimestampedModel):
     __tablename__ = "schools"
     name = Column(String)
@@ -42,6 +63,20 @@ class NetworkOutage(TimestampedModel):
     school = relationship("School", backref="outages")
 
 
+class ShadowEvaluation(TimestampedModel):
+    """Agreement between the active and a shadow model over one batch of live rows"""
+    __tablename__ = "shadow_evaluations"
+    active_version = Column(Integer)
+    shadow_version = Column(Integer)
+    n_rows = Column(Integer)
+    # Rows where both models give the same risk level
+    agreements = Column(Integer)
+    # Shadow minus active risk score
+    mean_delta = Column(Float)
+    mean_abs_delta = Column(Float)
+    max_abs_delta = Column(Float)
+
+
 class User(TimestampedModel, SQLAlchemyBaseUserTableUUID):
     first_name = Column(String(255), nullable=False)
     last_name = Column(String(255), nullable=False)
@@ -1,11 +1,30 @@
+import asyncio
+import json
+import os
 from fastapi import HTTPException, Depends, APIRouter
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from .models.database import WeatherRecord, School, NetworkOutage, User
+from .models.database import WeatherRecord, School, NetworkOutage, ShadowEvaluation, User
 from .schemas.schools import SchoolCreate
+from .schemas.predictions import BatchPredictionRequest
+from .schemas.weather import BulkWeatherRequest
 from .utils.database import get_db
+from .services.weather_service import WeatherService
+from .services.prediction_service import PredictionService
+from .services.alert_service import AlertService
+from .services.training_jobs import TrainingJobManager
+from .services.forecast_service import ForecastService
 
 
 app_routes = APIRouter()
+weather_service = WeatherService()
+prediction_service = PredictionService()
+alert_service = AlertService()
+training_jobs = TrainingJobManager(prediction_service)
+forecast_service = ForecastService(weather_service, prediction_service)
+
+# Schools scored per model call when streaming batch predictions
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_PREDICTION_CHUNK_SIZE', '500'))
 
 
 @app_routes.post("/schools/", tags=["schools"])
@@ -29,18 +48,40 @@ async def get_weather(lat: float, lon: float, db: Session = Depends(get_db)):
     if weather_data is None:
         raise HTTPException(status_code=500, detail="Failed to fetch weather data")
 
-    # Store weather data in database
-    weather_record = WeatherRecord(
-        latitude=lat,
-        longitude=lon,
-        **{k: v for k, v in weather_data.items() if k != 'timestamp'}
-    )
-    db.add(weather_record)
-    db.commit()
+    # Store weather data in database; stale observations are already stored
+    if not weather_data["stale"]:
+        weather_record = WeatherRecord(
+            latitude=lat,
+            longitude=lon,
+            **{k: v for k, v in weather_data.items() if k not in ('timestamp', 'stale', 'age_seconds')}
+        )
+        db.add(weather_record)
+        db.flush()
+        prediction_service.feature_store.record(db, weather_record)
+        db.commit()
 
     return weather_data
 
 
+@app_routes.post("/weather/bulk")
+async def get_weather_bulk(request: BulkWeatherRequest):
+    """
+    Current weather for many coordinates, one lookup per grid cell, streamed
+    as one JSON object per line in the order cells complete
+    """
+    async def stream():
+        async for result in weather_service.get_current_weather_bulk(request.coordinates):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app_routes.get("/weather/cache")
+async def weather_cache_stats():
+    """Weather cell cache counters, upstream calls, coalesced requests and circuit state"""
+    return weather_service.cache_stats()
+
+
 @app_routes.post("/outages/report/{school_id}")
 async def report_outage(school_id: int, db: Session = Depends(get_db)):
     school = db.query(School).filter(School.id == school_id).first()
@@ -70,16 +111,21 @@ async def predict_outage(school_id: int, db: Session = Depends(get_db)):
     if not weather_data:
         raise HTTPException(status_code=500, detail="Failed to fetch weather data")
 
-    # Train model if not trained
+    # Train model in the background if not trained
     if not prediction_service.is_trained:
-        if not prediction_service.train_model(db):
-            return {
-                "warning": "Not enough historical data for accurate predictions",
-                "recommendation": "Continue collecting weather and outage data"
-            }
+        job = training_jobs.submit()
+        return {
+            "warning": "Model not trained yet - training started in the background",
+            "recommendation": "Retry shortly or continue collecting weather and outage data",
+            "job_id": job["job_id"]
+        }
 
-    # Get prediction
-    prediction = prediction_service.predict_outage_risk(weather_data)
+    # Get prediction, with rolling aggregates read from the feature store
+    feature_store = prediction_service.feature_store
+    prediction = prediction_service.predict_outage_risk(
+        feature_store.enrich(weather_data, feature_store.latest(db, school.latitude, school.longitude)),
+        location=(school.latitude, school.longitude)
+    )
 
     return {
         "school_name": school.name,
@@ -88,13 +134,258 @@ async def predict_outage(school_id: int, db: Session = Depends(get_db)):
     }
 
 
+@app_routes.post("/predict/batch", tags=["predictions"])
+async def predict_batch(request: BatchPredictionRequest, db: Session = Depends(get_db)):
+    """Predict outage risk for many schools, streamed as one JSON object per line"""
+    query = db.query(School.id, School.name, School.latitude, School.longitude)
+    if request.school_ids != "all":
+        query = query.filter(School.id.in_(request.school_ids))
+    schools = query.all()
+
+    if not prediction_service.is_trained:
+        job = training_jobs.submit()
+        return {
+            "warning": "Model not trained yet - training started in the background",
+            "recommendation": "Retry shortly or continue collecting weather and outage data",
+            "job_id": job["job_id"]
+        }
+
+    missing = []
+    if request.school_ids != "all":
+        found = {school.id for school in schools}
+        missing = [school_id for school_id in request.school_ids if school_id not in found]
+
+    # Rolling aggregates for every school in one query, before the session closes
+    rolling = prediction_service.feature_store.latest_many(
+        db, [(school.latitude, school.longitude) for school in schools]
+    )
+
+    return StreamingResponse(
+        stream_batch_predictions(schools, missing, rolling),
+        media_type="application/x-ndjson"
+    )
+
+
+async def stream_batch_predictions(schools, missing, rolling):
+    """Fetch weather and score schools chunk by chunk, yielding NDJSON lines"""
+    for school_id in missing:
+        yield json.dumps({"school_id": school_id, "error": "School not found"}) + "\n"
+
+    for start in range(0, len(schools), BATCH_CHUNK_SIZE):
+        chunk = schools[start:start + BATCH_CHUNK_SIZE]
+        weather = await asyncio.gather(*(
+            weather_service.get_current_weather(school.latitude, school.longitude)
+            for school in chunk
+        ))
+
+        fetched = [(school, data) for school, data in zip(chunk, weather) if data]
+        feature_store = prediction_service.feature_store
+        predictions = prediction_service.predict_outage_risk_batch(
+            [
+                feature_store.enrich(
+                    data, rolling.get(feature_store.location_key(school.latitude, school.longitude))
+                )
+                for school, data in fetched
+            ],
+            [(school.latitude, school.longitude) for school, _ in fetched]
+        )
+
+        for school, data in zip(chunk, weather):
+            if not data:
+                yield json.dumps({
+                    "school_id": school.id,
+                    "school_name": school.name,
+                    "error": "Failed to fetch weather data"
+                }) + "\n"
+        for (school, data), prediction in zip(fetched, predictions):
+            yield json.dumps({
+                "school_id": school.id,
+                "school_name": school.name,
+                "current_weather": data,
+                "prediction": prediction
+            }) + "\n"
+
+
+@app_routes.get("/predict/{school_id}/forecast", tags=["predictions"])
+async def predict_forecast(school_id: int, db: Session = Depends(get_db)):
+    """Outage risk curve over the weather forecast for the next hours"""
+    school = db.query(School).filter(School.id == school_id).first()
+    if not school:
+        raise HTTPException(status_code=404, detail="School not found")
+
+    if not prediction_service.is_trained:
+        job = training_jobs.submit()
+        return {
+            "warning": "Model not trained yet - training started in the background",
+            "recommendation": "Retry shortly or continue collecting weather and outage data",
+            "job_id": job["job_id"]
+        }
+
+    forecast = await forecast_service.risk_curve(db, school.latitude, school.longitude)
+    if forecast is None:
+        raise HTTPException(status_code=500, detail="Failed to fetch weather forecast")
+
+    return {
+        "school_name": school.name,
+        "forecast": forecast
+    }
+
+
+@app_routes.post("/predict/forecast/batch", tags=["predictions"])
+async def predict_forecast_batch(request: BatchPredictionRequest, db: Session = Depends(get_db)):
+    """Risk curves for many schools, one forecast fetch and scoring pass per grid cell"""
+    query = db.query(School.id, School.name, School.latitude, School.longitude)
+    if request.school_ids != "all":
+        query = query.filter(School.id.in_(request.school_ids))
+    schools = query.all()
+
+    if not prediction_service.is_trained:
+        job = training_jobs.submit()
+        return {
+            "warning": "Model not trained yet - training started in the background",
+            "recommendation": "Retry shortly or continue collecting weather and outage data",
+            "job_id": job["job_id"]
+        }
+
+    # Schools in the same grid cell share one curve
+    first_in_cell = {}
+    for school in schools:
+        first_in_cell.setdefault(forecast_service.cell_for(school.latitude, school.longitude), school)
+    curves = dict(zip(first_in_cell, await asyncio.gather(*(
+        forecast_service.risk_curve(db, school.latitude, school.longitude)
+        for school in first_in_cell.values()
+    ))))
+
+    results = []
+    for school in schools:
+        forecast = curves[forecast_service.cell_for(school.latitude, school.longitude)]
+        if forecast is None:
+            results.append({
+                "school_id": school.id,
+                "school_name": school.name,
+                "error": "Failed to fetch weather forecast"
+            })
+        else:
+            results.append({"school_id": school.id, "school_name": school.name, "forecast": forecast})
+    return results
+
+
 @app_routes.get("/predictions/retrain", tags=["predictions"])
-async def retrain_model(db: Session = Depends(get_db)):
-    """Force model retraining"""
-    success = prediction_service.train_model(db)
+async def retrain_model(incremental: bool = False, regions: bool = False):
+    """
+    Start model retraining in the background, or only fold in data added
+    since the last run. With regions=true, retrain the per-region models.
+    """
+    job = training_jobs.submit(incremental=incremental, regions=regions)
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "message": "Model retraining started"
+    }
+
+
+@app_routes.get("/predictions/retrain/{job_id}", tags=["predictions"])
+async def retrain_status(job_id: str):
+    """Get the status of a retraining job"""
+    job = training_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return {
+        **job,
+        "message": (
+            "Not enough data for training" if job["success"] is False
+            else "Model retrained successfully" if job["success"]
+            else job["error"] or "Training in progress"
+        )
+    }
+
+
+@app_routes.get("/predictions/regions", tags=["predictions"])
+async def list_region_models():
+    """List regions with their own model and region model cache stats"""
     return {
-        "success": success,
-        "message": "Model retrained successfully" if success else "Not enough data for training"
+        "cell_deg": prediction_service.region_models.cell_deg,
+        "regions": prediction_service.region_models.regions(),
+        "cache": prediction_service.region_models.stats()
+    }
+
+
+@app_routes.get("/predictions/cache", tags=["predictions"])
+async def prediction_cache_stats():
+    """
+    Prediction cache hit/miss counters, the quantization steps in use and how
+    far they move the active model's scores on its training rows
+    """
+    return {
+        **prediction_service.prediction_cache.stats(),
+        "steps": prediction_service.cache_steps,
+        "quantization": prediction_service.metrics.get("cache_quantization"),
+        "forecast": forecast_service.curves.stats()
+    }
+
+
+@app_routes.get("/predictions/drift", tags=["predictions"])
+async def prediction_drift(retrain: bool = False):
+    """
+    Drift of live model inputs and risk scores from the active model's
+    training distribution. With retrain=true, a drifted model is retrained
+    in the background.
+    """
+    report = prediction_service.drift_monitor.report()
+    if retrain and report["drifted"]:
+        job = training_jobs.submit()
+        report["retrain_job_id"] = job["job_id"]
+    return report
+
+
+@app_routes.get("/predictions/shadow", tags=["predictions"])
+async def shadow_status(limit: int = 20, db: Session = Depends(get_db)):
+    """Shadow model counters and its most recent batch evaluations"""
+    evaluations = db.query(ShadowEvaluation).order_by(ShadowEvaluation.id.desc()).limit(limit).all()
+    return {
+        **prediction_service.shadow.stats(),
+        "evaluations": evaluations
+    }
+
+
+@app_routes.post("/predictions/shadow/{version}", tags=["predictions"])
+async def start_shadow(version: int):
+    """Score live traffic with a stored model version alongside the active model"""
+    started = await asyncio.get_running_loop().run_in_executor(
+        None, prediction_service.start_shadow, version
+    )
+    if not started:
+        raise HTTPException(status_code=404, detail="Model version not found")
+    return prediction_service.shadow.stats()
+
+
+@app_routes.delete("/predictions/shadow", tags=["predictions"])
+async def stop_shadow():
+    """Stop shadow scoring after flushing queued rows"""
+    await asyncio.get_running_loop().run_in_executor(None, prediction_service.stop_shadow)
+    return prediction_service.shadow.stats()
+
+
+@app_routes.get("/predictions/models", tags=["predictions"])
+async def list_models():
+    """List stored model versions"""
+    selection = prediction_service.model_selection or {}
+    return {
+        "active_version": prediction_service.model_version,
+        "versions": prediction_service.model_store.list_versions(),
+        "model_params": prediction_service.model_params,
+        "leaderboard": selection.get("leaderboard")
+    }
+
+
+@app_routes.post("/predictions/models/{version}/activate", tags=["predictions"])
+async def activate_model(version: int):
+    """Roll back or forward to a stored model version"""
+    if not prediction_service.load_artifact(version):
+        raise HTTPException(status_code=404, detail="Model version not found")
+    return {
+        "active_version": prediction_service.model_version,
+        "metrics": prediction_service.metrics
     }
 
 
@@ -114,11 +405,20 @@ async def predict_and_alert(school_id: int, db: Session = Depends(get_db)):
     if not weather_data:
         raise HTTPException(status_code=500, detail="Failed to fetch weather data")
 
-    # Get prediction
+    # Never alert from the untrained default score
     if not prediction_service.is_trained:
-        prediction_service.train_model(db)
+        job = training_jobs.submit()
+        return {
+            "warning": "Model not trained yet - training started in the background",
+            "recommendation": "Retry shortly or continue collecting weather and outage data",
+            "job_id": job["job_id"]
+        }
 
-    prediction = prediction_service.predict_outage_risk(weather_data)
+    feature_store = prediction_service.feature_store
+    prediction = prediction_service.predict_outage_risk(
+        feature_store.enrich(weather_data, feature_store.latest(db, school.latitude, school.longitude)),
+        location=(school.latitude, school.longitude)
+    )
     prediction['current_weather'] = weather_data
 
     # Send alerts if risk is high enough
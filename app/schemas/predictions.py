@@ -0,0 +1,6 @@
+from typing import List, Literal, Union
+from pydantic import BaseModel
+
+
+class BatchPredictionRequest(BaseModel):
+    school_ids: Union[List[int], Literal["all"]] = "all"
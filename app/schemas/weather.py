@@ -0,0 +1,31 @@
+import math
+import os
+from typing import Annotated, List, Tuple
+from dotenv import load_dotenv
+from pydantic import AfterValidator, BaseModel, Field
+
+load_dotenv()
+
+# Every coordinate can cost an upstream call, so one request is capped
+MAX_BULK_COORDINATES = int(os.getenv('WEATHER_BULK_MAX_COORDINATES', '1000'))
+
+
+def within(limit: float):
+    """
+    Reject finite values outside +/- limit. NaN and infinity pass through and
+    are reported per coordinate as invalid, since a validation error echoing
+    them back could not be rendered as JSON.
+    """
+    def check(value: float) -> float:
+        if math.isfinite(value) and abs(value) > limit:
+            raise ValueError(f"must be between -{limit:g} and {limit:g}")
+        return value
+    return AfterValidator(check)
+
+
+Latitude = Annotated[float, within(90)]
+Longitude = Annotated[float, within(180)]
+
+
+class BulkWeatherRequest(BaseModel):
+    coordinates: List[Tuple[Latitude, Longitude]] = Field(max_length=MAX_BULK_COORDINATES)
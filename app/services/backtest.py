@@ -0,0 +1,281 @@
+"""
+Walk-forward backtest: replay the weather timeline, retraining at fixed
+intervals on everything whose label was known by then and scoring the next
+interval in bulk, then report precision / recall / lead-time metrics.
+
+Usage:
+    python -m app.services.backtest [--days 365] [--retrain-every 30] [--thresholds 0.4,0.7] [--chunk-rows 100000] [--report path]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from scipy.spatial import cKDTree
+from sklearn.metrics import average_precision_score, roc_auc_score
+from sqlalchemy.orm import Session
+
+from .prediction_service import PredictionService
+from ..models.database import School
+from ..utils.labeling import OUTAGE_WINDOW, chord_radius, to_unit_vectors
+
+load_dotenv()
+
+# Alert service thresholds: email from 0.4, SMS from 0.7
+DEFAULT_THRESHOLDS = (0.4, 0.7)
+
+
+def retrain_points(first: np.datetime64, last: np.datetime64, days: float,
+                   retrain_every_days: float) -> np.ndarray:
+    """Retrain times every retrain_every_days over the final days before last"""
+    step = np.timedelta64(int(retrain_every_days * 86_400e6), 'us')
+    start = max(first + step, last - np.timedelta64(int(days * 86_400e6), 'us'))
+    return np.arange(start, last + np.timedelta64(1, 'us'), step)
+
+
+def threshold_metrics(scores: np.ndarray, y: np.ndarray, thresholds) -> List[Dict]:
+    """
+    Row-level precision, recall and F1 at each threshold from one sort: the
+    number of alerts and true alerts above any threshold are read off the
+    cumulative counts of the descending scores.
+    """
+    order = np.argsort(-scores, kind='stable')
+    true_alerts = np.cumsum(y[order] == 1)
+    n_positive = int(true_alerts[-1]) if len(true_alerts) else 0
+
+    results = []
+    for threshold in thresholds:
+        n_alerts = int(np.searchsorted(-scores[order], -threshold, side='right'))
+        n_true = int(true_alerts[n_alerts - 1]) if n_alerts else 0
+        precision = n_true / n_alerts if n_alerts else 0.0
+        recall = n_true / n_positive if n_positive else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        results.append({
+            "threshold": float(threshold),
+            "alerts": n_alerts,
+            "precision": precision,
+            "recall": recall,
+            "f1": f1
+        })
+    return results
+
+
+def detect_outages(alert_times: np.ndarray, outage_times: np.ndarray, window=OUTAGE_WINDOW):
+    """
+    For each outage, whether an alert fired in the window before it started,
+    and the lead time in hours from the earliest such alert (NaN if none).
+    """
+    alert_times = np.sort(alert_times)
+    lead_hours = np.full(len(outage_times), np.nan)
+    if not len(alert_times) or not len(outage_times):
+        return np.zeros(len(outage_times), dtype=bool), lead_hours
+
+    first = np.searchsorted(alert_times, outage_times - np.timedelta64(window), side='left')
+    earliest = alert_times[np.minimum(first, len(alert_times) - 1)]
+    detected = (first < len(alert_times)) & (earliest <= outage_times)
+    lead_hours[detected] = (
+        (outage_times[detected] - earliest[detected]) / np.timedelta64(1, 'h')
+    )
+    return detected, lead_hours
+
+
+def event_metrics(alert_times: np.ndarray, outage_times: np.ndarray, **locations) -> Dict:
+    """
+    Outage-level recall and lead times. With alert_lats / alert_lons,
+    outage_school_ids, schools (id -> (lat, lon)) and radius_km, only alerts
+    raised within radius_km of the outage's school count, as in spatial
+    labeling; otherwise any alert counts.
+    """
+    if not locations:
+        detected, lead_hours = detect_outages(alert_times, outage_times)
+    else:
+        detected = np.zeros(len(outage_times), dtype=bool)
+        lead_hours = np.full(len(outage_times), np.nan)
+        school_ids = locations["outage_school_ids"]
+        schools = locations["schools"]
+        tree = cKDTree(to_unit_vectors(locations["alert_lats"], locations["alert_lons"]))
+        for school_id in np.unique(school_ids):
+            if school_id not in schools:
+                continue
+            rows = np.flatnonzero(school_ids == school_id)
+            nearby = tree.query_ball_point(
+                to_unit_vectors(*schools[school_id])[0], chord_radius(locations["radius_km"])
+            )
+            detected[rows], lead_hours[rows] = detect_outages(
+                alert_times[nearby], outage_times[rows]
+            )
+
+    leads = lead_hours[detected]
+    return {
+        "outages": int(len(outage_times)),
+        "detected": int(detected.sum()),
+        "recall": float(detected.mean()) if len(detected) else 0.0,
+        "lead_hours_mean": float(leads.mean()) if len(leads) else None,
+        "lead_hours_p50": float(np.median(leads)) if len(leads) else None,
+        "lead_hours_p10": float(np.percentile(leads, 10)) if len(leads) else None
+    }
+
+
+def run_backtest(service: PredictionService, db: Session, days: float = 365,
+                 retrain_every_days: float = 30, thresholds=DEFAULT_THRESHOLDS,
+                 n_jobs: int = -1, chunk_rows: int = 100_000) -> Optional[Dict]:
+    """
+    Walk forward over the last days of history. At each retrain point the
+    model is fitted (with the service's params and sampling) on rows whose
+    outage window closed before that point, so no label leaks from the
+    future, and every row up to the next point is scored in chunks of
+    chunk_rows, which bounds the per-tree probabilities held at once.
+    Returns the report, or None without enough data.
+    """
+    training_set = service.load_training_set(db)
+    if training_set is None:
+        return None
+
+    order = np.argsort(training_set["timestamp"], kind='stable')
+    timestamps = training_set["timestamp"][order]
+    X, y = training_set["X"][order], training_set["y"][order]
+    latitudes = training_set["latitude"][order]
+    longitudes = training_set["longitude"][order]
+    valid = ~np.isnat(timestamps)
+    timestamps, X, y = timestamps[valid], X[valid], y[valid]
+    latitudes, longitudes = latitudes[valid], longitudes[valid]
+
+    points = retrain_points(timestamps[0], timestamps[-1], days, retrain_every_days)
+    if not len(points):
+        return None
+    bounds = np.append(points, timestamps[-1] + np.timedelta64(1, 'us'))
+    train_ends = np.searchsorted(timestamps, points - np.timedelta64(OUTAGE_WINDOW), side='right')
+    score_starts = np.searchsorted(timestamps, bounds[:-1], side='left')
+    score_ends = np.searchsorted(timestamps, bounds[1:], side='left')
+
+    scores = np.full(len(y), np.nan)
+    windows = []
+    for point, train_end, score_start, score_end in zip(points, train_ends, score_starts, score_ends):
+        window = {
+            "retrain_at": str(point),
+            "train_rows": int(train_end),
+            "scored_rows": int(score_end - score_start)
+        }
+        windows.append(window)
+        if score_end == score_start or len(np.unique(y[:train_end])) < 2:
+            continue
+
+        start = time.perf_counter()
+        model, scaler, _, _, _ = service.fit_forest(
+            X[:train_end], y[:train_end], timestamps[:train_end], n_jobs=n_jobs
+        )
+        window["fit_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for chunk_start in range(score_start, score_end, chunk_rows):
+            chunk_end = min(chunk_start + chunk_rows, score_end)
+            proba, classes = service.predict_proba(X[chunk_start:chunk_end], model, scaler)
+            scores[chunk_start:chunk_end] = proba[:, list(classes).index(1)]
+        window["score_seconds"] = time.perf_counter() - start
+        window["positive_rate"] = float(y[score_start:score_end].mean())
+
+    scored = ~np.isnan(scores)
+    if not scored.any():
+        return None
+    y_scored, s_scored = y[scored], scores[scored]
+    both_classes = len(np.unique(y_scored)) == 2
+    period_start, period_end = timestamps[scored].min(), timestamps[scored].max()
+    period_days = max((period_end - period_start) / np.timedelta64(1, 'D'), 1e-9)
+
+    outages = training_set["outages"]
+    in_period = (outages["start_time"] >= period_start) & (outages["start_time"] <= period_end)
+    outage_times = outages["start_time"][in_period]
+    spatial = {}
+    if service.labeling_mode == 'spatial':
+        schools = {
+            school.id: (school.latitude, school.longitude)
+            for school in db.query(School.id, School.latitude, School.longitude)
+        }
+        spatial = {"outage_school_ids": outages["school_id"][in_period], "schools": schools,
+                   "radius_km": service.label_radius_km}
+
+    rows = threshold_metrics(s_scored, y_scored, thresholds)
+    events = []
+    for entry in rows:
+        alerts = np.flatnonzero(scored)[s_scored >= entry["threshold"]]
+        if spatial:
+            spatial.update(alert_lats=latitudes[alerts], alert_lons=longitudes[alerts])
+        entry["alerts_per_day"] = entry["alerts"] / period_days
+        events.append({"threshold": entry["threshold"],
+                       **event_metrics(timestamps[alerts], outage_times, **spatial)})
+
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "config": {
+            "days": days,
+            "retrain_every_days": retrain_every_days,
+            "labeling_mode": service.labeling_mode,
+            "feature_names": training_set["feature_names"],
+            "model_params": service.model_params,
+            "sampling": service.sampling_strategies,
+            "max_training_rows": service.max_training_rows
+        },
+        "period": {"start": str(period_start), "end": str(period_end)},
+        "scored_rows": int(scored.sum()),
+        "positive_rate": float(y_scored.mean()),
+        "average_precision": float(average_precision_score(y_scored, s_scored)) if both_classes else None,
+        "roc_auc": float(roc_auc_score(y_scored, s_scored)) if both_classes else None,
+        "thresholds": rows,
+        "events": events,
+        "windows": windows
+    }
+
+
+def main():
+    from ..utils.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of outage predictions")
+    parser.add_argument('--days', type=float, default=float(os.getenv('BACKTEST_DAYS', '365')))
+    parser.add_argument('--retrain-every', type=float,
+                        default=float(os.getenv('BACKTEST_RETRAIN_DAYS', '30')))
+    parser.add_argument('--thresholds', default=','.join(map(str, DEFAULT_THRESHOLDS)))
+    parser.add_argument('--jobs', type=int, default=int(os.getenv('BACKTEST_JOBS', '-1')))
+    parser.add_argument('--chunk-rows', type=int,
+                        default=int(os.getenv('BACKTEST_CHUNK_ROWS', '100000')))
+    parser.add_argument('--report', help="JSON report path (default: BACKTEST_REPORT_DIR/backtest_<time>.json)")
+    args = parser.parse_args()
+
+    service = PredictionService()
+    service.load_artifact()
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        report = run_backtest(
+            service, db, args.days, args.retrain_every,
+            [float(value) for value in args.thresholds.split(',')], args.jobs, args.chunk_rows
+        )
+    finally:
+        db.close()
+
+    if report is None:
+        print("Not enough data to backtest")
+        return
+    report["runtime_seconds"] = time.perf_counter() - started
+
+    path = Path(args.report or Path(os.getenv('BACKTEST_REPORT_DIR', './backtest_reports')) /
+                f"backtest_{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+
+    print(f"{report['scored_rows']} rows scored from {report['period']['start']} to "
+          f"{report['period']['end']} in {report['runtime_seconds']:.1f}s  "
+          f"AP={report['average_precision']}  AUC={report['roc_auc']}")
+    for row, events in zip(report["thresholds"], report["events"]):
+        print(f"  >= {row['threshold']:.2f}: precision={row['precision']:.3f} recall={row['recall']:.3f} "
+              f"alerts/day={row['alerts_per_day']:.1f} outages caught={events['detected']}/{events['outages']} "
+              f"median lead={events['lead_hours_p50']}h")
+    print(f"Report written to {path}")
+
+
+if __name__ == '__main__':
+    main()
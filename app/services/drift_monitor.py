@@ -0,0 +1,167 @@
+import os
+import threading
+import numpy as np
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Fixed bin edges for risk scores
+SCORE_EDGES = np.linspace(0.0, 1.0, 11)[1:-1]
+# Floor for bin proportions so empty bins do not make PSI infinite
+PSI_EPSILON = 1e-4
+
+
+def build_reference(X: np.ndarray, feature_names: List[str], n_bins: int = 10) -> Dict:
+    """
+    Summarize a training feature matrix for drift checks: per-feature
+    quantile bin edges and the share of rows in each bin (NaNs excluded),
+    plus the share of missing values.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    interior = np.linspace(0, 1, n_bins + 1)[1:-1]
+    edges = np.nanquantile(X, interior, axis=0).T if len(X) else np.zeros((X.shape[1], n_bins - 1))
+    edges = np.nan_to_num(edges)
+
+    bins = (X[:, :, np.newaxis] > edges[np.newaxis]).sum(axis=2)
+    missing = np.isnan(X)
+    proportions = np.empty((X.shape[1], n_bins))
+    for feature in range(X.shape[1]):
+        present = bins[~missing[:, feature], feature]
+        counts = np.bincount(present, minlength=n_bins)
+        proportions[feature] = counts / max(counts.sum(), 1)
+
+    return {
+        "features": list(feature_names),
+        "edges": edges.tolist(),
+        "proportions": proportions.tolist(),
+        "missing_rate": missing.mean(axis=0).tolist() if len(X) else [0.0] * X.shape[1],
+        "n_samples": int(len(X))
+    }
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Population stability index between bin proportions, along the last axis"""
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=-1)
+
+
+class DriftMonitor:
+    """
+    Streaming drift monitor over live model inputs and risk scores.
+
+    Every scored row is binned against the training distribution stored with
+    the model and counted in fixed-size arrays, so memory does not grow with
+    traffic and each observation costs a handful of vectorized NumPy calls.
+    Counts are kept for two tumbling windows of DRIFT_WINDOW rows; drift is
+    the population stability index (PSI) of the current and previous window
+    against the training proportions. Score drift is measured against the
+    first DRIFT_SCORE_REFERENCE scores the model produced after activation,
+    since training-set scores of a fitted forest are over-confident.
+    """
+
+    def __init__(self, window: int = None, threshold: float = None,
+                 score_reference_size: int = None, min_samples: int = None):
+        self.window = int(window or os.getenv('DRIFT_WINDOW', '5000'))
+        self.threshold = float(threshold or os.getenv('DRIFT_THRESHOLD', '0.2'))
+        self.score_reference_size = int(
+            score_reference_size or os.getenv('DRIFT_SCORE_REFERENCE', '1000')
+        )
+        self.min_samples = int(min_samples or os.getenv('DRIFT_MIN_SAMPLES', '500'))
+        self._lock = threading.Lock()
+        self.reset(None)
+
+    def reset(self, reference: Optional[Dict], model_version=None):
+        """Start monitoring against a new training reference, clearing all counts"""
+        with self._lock:
+            self.reference = reference
+            self.model_version = model_version
+            n_features = len(reference["features"]) if reference else 0
+            n_bins = len(reference["proportions"][0]) if reference and n_features else 0
+            self._edges = np.asarray(reference["edges"], dtype=np.float64) if n_features else None
+            self._expected = np.asarray(reference["proportions"]) if n_features else None
+            self._n_features, self._n_bins = n_features, n_bins
+            self._bin_offsets = np.arange(n_features) * n_bins
+            self._missing_slots = n_features * n_bins + np.arange(n_features)
+            # Per window: feature bins, then one missing-value slot per feature
+            self._feature_counts = np.zeros((2, n_features * n_bins + n_features), dtype=np.int64)
+            self._score_counts = np.zeros((2, len(SCORE_EDGES) + 1), dtype=np.int64)
+            self._score_reference = np.zeros(len(SCORE_EDGES) + 1, dtype=np.int64)
+            self._rows = np.zeros(2, dtype=np.int64)
+            self.observed = 0
+
+    def observe(self, features: np.ndarray, scores: np.ndarray):
+        """Count a batch of feature rows (in reference feature order) and their risk scores"""
+        if self._edges is None:
+            return
+        score_bins = np.searchsorted(SCORE_EDGES, scores, side='right')
+        bins = (features[:, :, np.newaxis] > self._edges).sum(axis=2)
+        slots = bins + self._bin_offsets
+        missing = np.isnan(features)
+        if missing.any():
+            slots = np.where(missing, self._missing_slots, slots)
+
+        with self._lock:
+            if self._rows[1] >= self.window:
+                self._feature_counts[0] = self._feature_counts[1]
+                self._score_counts[0] = self._score_counts[1]
+                self._rows[0] = self._rows[1]
+                self._feature_counts[1] = 0
+                self._score_counts[1] = 0
+                self._rows[1] = 0
+            self._feature_counts[1] += np.bincount(slots.ravel(), minlength=self._feature_counts.shape[1])
+            score_counts = np.bincount(score_bins, minlength=len(SCORE_EDGES) + 1)
+            if self.observed < self.score_reference_size:
+                self._score_reference += score_counts
+            else:
+                self._score_counts[1] += score_counts
+            self._rows[1] += len(features)
+            self.observed += len(features)
+
+    def report(self) -> Dict:
+        """Drift scores per feature and for risk scores, and whether any crosses the threshold"""
+        with self._lock:
+            counts = self._feature_counts.sum(axis=0)
+            score_counts = self._score_counts.sum(axis=0)
+            score_reference = self._score_reference.copy()
+            rows = int(self._rows.sum())
+
+        result = {
+            "model_version": self.model_version,
+            "observed": self.observed,
+            "window_rows": rows,
+            "threshold": self.threshold,
+            "features": {},
+            "scores": None,
+            "drifted": False
+        }
+        if self._edges is None or rows < self.min_samples:
+            return result
+
+        n_bins_total = self._n_features * self._n_bins
+        binned = counts[:n_bins_total].reshape(self._n_features, self._n_bins)
+        present = binned.sum(axis=1, keepdims=True)
+        feature_psi = psi(self._expected, binned / np.maximum(present, 1))
+        missing_rate = counts[n_bins_total:] / rows
+        for name, value, rate, expected_rate in zip(
+            self.reference["features"], feature_psi, missing_rate, self.reference["missing_rate"]
+        ):
+            result["features"][name] = {
+                "psi": float(value),
+                "missing_rate": float(rate),
+                "training_missing_rate": float(expected_rate),
+                "drifted": bool(value > self.threshold)
+            }
+
+        if score_counts.sum() >= self.min_samples and score_reference.sum():
+            score_psi = float(psi(
+                score_reference / score_reference.sum(), score_counts / score_counts.sum()
+            ))
+            result["scores"] = {"psi": score_psi, "drifted": score_psi > self.threshold}
+
+        result["drifted"] = bool(
+            any(entry["drifted"] for entry in result["features"].values())
+            or (result["scores"] or {}).get("drifted", False)
+        )
+        return result
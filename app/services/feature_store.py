@@ -0,0 +1,332 @@
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from pandas.api.indexers import BaseIndexer
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from .region_models import region_key
+from ..models.database import WeatherRecord, WeatherFeatures
+from ..utils.training_data import CHUNK_SIZE, load_feature_inputs
+
+load_dotenv()
+
+ROLLING_FEATURES = [
+    'max_wind_6h', 'max_wind_24h', 'rain_6h', 'rain_24h', 'humidity_trend_6h'
+]
+
+SHORT_WINDOW = timedelta(hours=6)
+LONG_WINDOW = timedelta(hours=24)
+# rain_last_hour is a rate over at most the last hour of an observation
+RAIN_COVERAGE = timedelta(hours=1)
+
+
+class _BoundsIndexer(BaseIndexer):
+    """Rolling windows given by precomputed [start, end) row bounds"""
+
+    def __init__(self, start: np.ndarray, end: np.ndarray):
+        super().__init__()
+        self.start = start
+        self.end = end
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.start, self.end
+
+
+def _hours(delta_us: np.ndarray) -> np.ndarray:
+    return delta_us / 3.6e9
+
+
+def rolling_features(group_ids: np.ndarray, timestamps: np.ndarray, wind_speed: np.ndarray,
+                     humidity: np.ndarray, rain_last_hour: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Rolling aggregates for every row, with windows ending at each row.
+
+    Rows must be sorted by (group, timestamp). A window covers the rows of the
+    same group with a timestamp greater than the row's timestamp minus the
+    window length, up to and including the row itself. Rain is accumulated as
+    rain_last_hour times the time covered since the group's previous
+    observation, capped at one hour.
+    """
+    n_rows = len(timestamps)
+    times = timestamps.astype('datetime64[us]').astype(np.int64)
+    new_group = np.ones(n_rows, dtype=bool)
+    new_group[1:] = group_ids[1:] != group_ids[:-1]
+
+    # Spread groups apart on one time axis so no window crosses a group
+    group_start = np.flatnonzero(new_group)
+    group_number = np.cumsum(new_group) - 1
+    long_us = np.timedelta64(LONG_WINDOW).astype('timedelta64[us]').astype(np.int64)
+    group_min = times[group_start]
+    group_span = np.diff(np.append(group_start, n_rows))
+    group_max = times[group_start + group_span - 1]
+    offsets = np.concatenate(([0], np.cumsum(group_max - group_min + 2 * long_us)[:-1]))
+    keys = times - group_min[group_number] + offsets[group_number]
+
+    coverage_us = np.timedelta64(RAIN_COVERAGE).astype('timedelta64[us]').astype(np.int64)
+    previous_gap = np.full(n_rows, coverage_us, dtype=np.int64)
+    previous_gap[1:] = np.minimum(np.diff(keys), coverage_us)
+    previous_gap[new_group] = coverage_us
+    rain_amount = np.nan_to_num(rain_last_hour.astype(np.float64)) * _hours(previous_gap)
+
+    end = np.arange(1, n_rows + 1, dtype=np.int64)
+    result = {"rain_amount": rain_amount}
+    for suffix, window in (("6h", SHORT_WINDOW), ("24h", LONG_WINDOW)):
+        window_us = np.timedelta64(window).astype('timedelta64[us]').astype(np.int64)
+        start = np.searchsorted(keys, keys - window_us, side='right').astype(np.int64)
+        indexer = _BoundsIndexer(start, end)
+        result[f"max_wind_{suffix}"] = pd.Series(wind_speed, dtype=float).rolling(
+            indexer, min_periods=1).max().to_numpy()
+        result[f"rain_{suffix}"] = pd.Series(rain_amount).rolling(
+            indexer, min_periods=1).sum().to_numpy()
+        if suffix == "6h":
+            humidity = humidity.astype(np.float64)
+            elapsed = _hours(keys - keys[start])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                trend = np.where(elapsed > 0, (humidity - humidity[start]) / elapsed, 0.0)
+            result["humidity_trend_6h"] = np.where(np.isnan(humidity), np.nan, trend)
+    return result
+
+
+def _nanmax(*values) -> Optional[float]:
+    present = [value for value in values if value is not None and not np.isnan(value)]
+    return max(present) if present else None
+
+
+class FeatureStore:
+    """
+    Rolling weather aggregates per location, materialized into
+    weather_features as each WeatherRecord is inserted.
+
+    Locations are grid cells of FEATURE_STORE_CELL_DEG degrees. Observations
+    are expected to arrive roughly in time order; history inserted out of band
+    is filled in by backfill().
+    """
+
+    def __init__(self, cell_deg: float = None):
+        self.cell_deg = float(cell_deg or os.getenv('FEATURE_STORE_CELL_DEG', '0.01'))
+
+    def location_key(self, latitude: float, longitude: float) -> Optional[str]:
+        return region_key(latitude, longitude, self.cell_deg)
+
+    def record(self, db: Session, weather: WeatherRecord) -> WeatherFeatures:
+        """Materialize the aggregates for a newly flushed weather record"""
+        key = self.location_key(weather.latitude, weather.longitude)
+        timestamp = weather.timestamp
+
+        window = []
+        if key is not None and timestamp is not None:
+            window = db.query(WeatherFeatures).filter(
+                WeatherFeatures.location_key == key,
+                WeatherFeatures.timestamp > timestamp - LONG_WINDOW,
+                WeatherFeatures.timestamp <= timestamp
+            ).order_by(WeatherFeatures.timestamp, WeatherFeatures.id).all()
+
+        coverage = RAIN_COVERAGE
+        if window:
+            coverage = min(timestamp - window[-1].timestamp, RAIN_COVERAGE)
+        rain_amount = (weather.rain_last_hour or 0) * coverage.total_seconds() / 3600
+        wind = weather.wind_speed
+        humidity = weather.humidity
+
+        short = [row for row in window if row.timestamp > timestamp - SHORT_WINDOW]
+        trend = None
+        if humidity is not None:
+            trend = 0.0
+            elapsed = (timestamp - short[0].timestamp).total_seconds() / 3600 if short else 0
+            if elapsed > 0:
+                first = short[0].humidity
+                trend = None if first is None else (humidity - first) / elapsed
+
+        features = WeatherFeatures(
+            weather_record_id=weather.id,
+            location_key=key,
+            timestamp=timestamp,
+            wind_speed=wind,
+            humidity=humidity,
+            rain_amount=rain_amount,
+            max_wind_6h=_nanmax(wind, *(row.wind_speed for row in short)),
+            max_wind_24h=_nanmax(wind, *(row.wind_speed for row in window)),
+            rain_6h=rain_amount + sum(row.rain_amount for row in short),
+            rain_24h=rain_amount + sum(row.rain_amount for row in window),
+            humidity_trend_6h=trend
+        )
+        db.add(features)
+        return features
+
+    def missing_count(self, db: Session, after_id: int = 0) -> int:
+        """Count weather records above after_id without materialized aggregates"""
+        return db.execute(
+            select(func.count(WeatherRecord.id))
+            .outerjoin(WeatherFeatures, WeatherFeatures.weather_record_id == WeatherRecord.id)
+            .where(WeatherFeatures.id.is_(None), WeatherRecord.id > after_id)
+        ).scalar()
+
+    def backfill(self, db: Session, after_id: int = 0, chunk_size: int = None) -> int:
+        """
+        Materialize aggregates for weather records that have none, e.g. history
+        loaded before the store existed. Only records above after_id are
+        checked; if any are missing, the input columns are streamed into
+        preallocated arrays, aggregates are recomputed in one vectorized pass
+        over the locations that have missing rows, and only missing rows are
+        inserted, chunk by chunk. Returns the number of rows added.
+        """
+        if not self.missing_count(db, after_id):
+            return 0
+
+        chunk_size = chunk_size or CHUNK_SIZE
+        weather = load_feature_inputs(db, chunk_size=chunk_size)
+        timestamps = weather["timestamp"]
+        latitudes, longitudes = weather["latitude"], weather["longitude"]
+
+        # Group by grid cell; unlocated or untimed records each form their own group
+        located = ~np.isnan(latitudes) & ~np.isnan(longitudes)
+        cells = np.column_stack((
+            np.floor(latitudes[located] / self.cell_deg),
+            np.floor(longitudes[located] / self.cell_deg)
+        )).astype(np.int64)
+        groups = np.full(len(timestamps), -1, dtype=np.int64)
+        if len(cells):
+            groups[located] = np.unique(cells, axis=0, return_inverse=True)[1].reshape(-1)
+        isolated = ~located | np.isnat(timestamps)
+        groups[isolated] = groups.max(initial=-1) + 1 + np.arange(isolated.sum())
+        sort_times = np.where(np.isnat(timestamps), np.datetime64(0, 'us'), timestamps)
+
+        # Only locations with a missing row need their windows recomputed
+        missing = ~weather["materialized"]
+        rows = np.flatnonzero(np.isin(groups, np.unique(groups[missing])))
+        order = rows[np.lexsort((weather["id"][rows], sort_times[rows], groups[rows]))]
+        aggregates = rolling_features(
+            groups[order], sort_times[order], weather["wind_speed"][order],
+            weather["humidity"][order], weather["rain_last_hour"][order]
+        )
+
+        positions = np.flatnonzero(missing[order])
+        for start in range(0, len(positions), chunk_size):
+            batch = []
+            for position in positions[start:start + chunk_size]:
+                index = order[position]
+                row = {
+                    "weather_record_id": int(weather["id"][index]),
+                    "location_key": self.location_key(latitudes[index], longitudes[index]),
+                    "timestamp": None if np.isnat(timestamps[index]) else timestamps[index].item(),
+                }
+                for name in ("wind_speed", "humidity"):
+                    value = weather[name][index]
+                    row[name] = None if np.isnan(value) else float(value)
+                for name in ["rain_amount", *ROLLING_FEATURES]:
+                    value = aggregates[name][position]
+                    row[name] = None if np.isnan(value) else float(value)
+                batch.append(row)
+            db.execute(insert(WeatherFeatures), batch)
+        db.commit()
+        return len(positions)
+
+    def latest_many(self, db: Session, locations: List[tuple], now: datetime = None) -> Dict[str, dict]:
+        """
+        Latest materialized aggregates per location key for many (lat, lon)
+        pairs in one query, ignoring rows older than the long window.
+        """
+        now = now or datetime.utcnow()
+        keys = {self.location_key(lat, lon) for lat, lon in locations} - {None}
+        if not keys:
+            return {}
+
+        newest = (
+            select(WeatherFeatures.location_key, func.max(WeatherFeatures.timestamp).label('timestamp'))
+            .where(
+                WeatherFeatures.location_key.in_(keys),
+                WeatherFeatures.timestamp > now - LONG_WINDOW
+            )
+            .group_by(WeatherFeatures.location_key)
+            .subquery()
+        )
+        rows = db.execute(
+            select(WeatherFeatures)
+            .join(newest, (WeatherFeatures.location_key == newest.c.location_key)
+                  & (WeatherFeatures.timestamp == newest.c.timestamp))
+            .order_by(WeatherFeatures.id)
+        ).scalars().all()
+
+        return {
+            row.location_key: {
+                "timestamp": row.timestamp,
+                **{name: getattr(row, name) for name in ROLLING_FEATURES}
+            }
+            for row in rows
+        }
+
+    def latest(self, db: Session, latitude: float, longitude: float, now: datetime = None) -> Optional[dict]:
+        return self.latest_many(db, [(latitude, longitude)], now).get(
+            self.location_key(latitude, longitude)
+        )
+
+    def fold(self, latest: Optional[dict], weather_data: dict, now: datetime = None) -> dict:
+        """
+        Combine the latest materialized aggregates with a live observation in
+        O(1). Values that dropped out of the windows since the stored row are
+        not expired, so this slightly overstates maxima and sums for stale rows.
+        """
+        now = now or datetime.utcnow()
+        wind = weather_data.get('wind_speed')
+        rain_rate = weather_data.get('rain_last_hour') or 0
+
+        if latest is None or now - latest["timestamp"] >= LONG_WINDOW:
+            rain = rain_rate * RAIN_COVERAGE.total_seconds() / 3600
+            return {
+                "max_wind_6h": wind, "max_wind_24h": wind,
+                "rain_6h": rain, "rain_24h": rain,
+                "humidity_trend_6h": 0.0
+            }
+
+        age = max(now - latest["timestamp"], timedelta(0))
+        rain = rain_rate * min(age, RAIN_COVERAGE).total_seconds() / 3600
+        fresh = age < SHORT_WINDOW
+        return {
+            "max_wind_6h": _nanmax(wind, latest["max_wind_6h"] if fresh else None),
+            "max_wind_24h": _nanmax(wind, latest["max_wind_24h"]),
+            "rain_6h": rain + ((latest["rain_6h"] or 0) if fresh else 0),
+            "rain_24h": rain + (latest["rain_24h"] or 0),
+            "humidity_trend_6h": (latest["humidity_trend_6h"] or 0.0) if fresh else 0.0
+        }
+
+    def enrich(self, weather_data: dict, latest: Optional[dict], now: datetime = None) -> dict:
+        """Live weather data extended with the folded rolling aggregates"""
+        return {**weather_data, **self.fold(latest, weather_data, now)}
+
+    def enrich_forecast(self, steps: List[dict], latest: Optional[dict]) -> List[dict]:
+        """
+        Forecast steps extended with rolling aggregates computed over the
+        forecast series itself, combined with the latest observed aggregates
+        for steps still inside their windows.
+        """
+        if not steps:
+            return []
+        times = np.array([step["timestamp"] for step in steps], dtype='datetime64[us]')
+        wind, humidity, rain = (
+            np.array([step.get(name) for step in steps], dtype=float)
+            for name in ('wind_speed', 'humidity', 'rain_last_hour')
+        )
+        rolled = rolling_features(np.zeros(len(steps), dtype=np.int64), times, wind, humidity, rain)
+
+        if latest is not None:
+            age = times - np.datetime64(latest["timestamp"], 'us')
+            for suffix, window in (("6h", SHORT_WINDOW), ("24h", LONG_WINDOW)):
+                inside = age < np.timedelta64(window)
+                observed_wind = latest[f"max_wind_{suffix}"]
+                if observed_wind is not None:
+                    rolled[f"max_wind_{suffix}"] = np.where(
+                        inside, np.fmax(rolled[f"max_wind_{suffix}"], observed_wind),
+                        rolled[f"max_wind_{suffix}"]
+                    )
+                rolled[f"rain_{suffix}"] = rolled[f"rain_{suffix}"] + np.where(
+                    inside, latest[f"rain_{suffix}"] or 0, 0
+                )
+
+        return [
+            {**step, **{name: float(rolled[name][row]) for name in ROLLING_FEATURES}}
+            for row, step in enumerate(steps)
+        ]
@@ -0,0 +1,109 @@
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+from .prediction_service import PredictionService
+from .region_models import cell_center, region_key
+from .weather_service import WeatherService
+from ..utils.cache import TTLCache
+
+load_dotenv()
+
+
+class ForecastService:
+    """
+    Outage risk curves over the provider's weather forecast.
+
+    Forecasts are fetched once per grid cell of FORECAST_CELL_DEG degrees, at
+    the cell centre, and every step is scored in one batched model call. The
+    resulting curve is cached for the cell until the provider's next forecast
+    update, so schools in the same cell share one fetch and one scoring pass.
+    """
+
+    def __init__(self, weather_service: WeatherService, prediction_service: PredictionService,
+                 cell_deg: float = None, hours: int = None):
+        self.weather_service = weather_service
+        self.prediction_service = prediction_service
+        self.cell_deg = float(cell_deg or os.getenv('FORECAST_CELL_DEG', '0.1'))
+        self.hours = int(hours or os.getenv('FORECAST_HOURS', '48'))
+        # The provider publishes a new forecast every update_hours (UTC)
+        self.update_hours = int(os.getenv('FORECAST_UPDATE_HOURS', '3'))
+        self.curves = TTLCache(
+            max_size=int(os.getenv('FORECAST_CACHE_SIZE', '1000')),
+            ttl=self.update_hours * 3600
+        )
+
+    def cell_for(self, latitude: float, longitude: float) -> Optional[str]:
+        return region_key(latitude, longitude, self.cell_deg)
+
+    def seconds_until_update(self, now: datetime = None) -> float:
+        """Seconds until the next provider forecast update"""
+        now = now or datetime.utcnow()
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        period = timedelta(hours=self.update_hours)
+        next_update = midnight + period * ((now - midnight) // period + 1)
+        return (next_update - now).total_seconds()
+
+    def score_curve(self, steps: List[dict], location: tuple, latest: Optional[dict],
+                    now: datetime = None) -> List[dict]:
+        """Score every forecast step in one batch and pair scores with step times"""
+        now = now or datetime.utcnow()
+        enriched = self.prediction_service.feature_store.enrich_forecast(steps, latest)
+        # Forecast steps are not live inputs: keep them out of drift and shadow
+        predictions = self.prediction_service.predict_outage_risk_batch(
+            enriched, [location] * len(enriched), live=False
+        )
+        return [
+            {
+                "timestamp": step["timestamp"],
+                "horizon_hours": round(
+                    (datetime.fromisoformat(step["timestamp"]) - now).total_seconds() / 3600, 2
+                ),
+                **{key: prediction[key] for key in (
+                    "risk_score", "confidence", "risk_interval", "message", "model_region"
+                )}
+            }
+            for step, prediction in zip(steps, predictions)
+        ]
+
+    async def risk_curve(self, db: Session, latitude: float, longitude: float) -> Optional[Dict]:
+        """
+        Risk curve for the next hours at a location, from the cell cache when
+        the cell's curve is still current. Rolling aggregates are seeded from
+        the latest observations at the location that first fills the cell.
+        Returns None when the forecast cannot be fetched.
+        """
+        cell = self.cell_for(latitude, longitude)
+        # Region retrains keep the global version, so they bump the generation
+        service = self.prediction_service
+        key = (cell, service.model_version, service.region_models.generation)
+        curve = self.curves.get(key)
+        if curve is not None:
+            return {**curve, "cached": True}
+
+        center = cell_center(latitude, longitude, self.cell_deg)
+        steps = await self.weather_service.single_flight(
+            ("forecast", cell, self.hours),
+            lambda: self.weather_service.get_forecast(*center, hours=self.hours)
+        )
+        if not steps:
+            return None
+
+        now = datetime.utcnow()
+        feature_store = service.feature_store
+        points = self.score_curve(
+            steps, center, feature_store.latest(db, latitude, longitude, now), now
+        )
+        peak = max(points, key=lambda point: point["risk_score"])
+        curve = {
+            "cell": cell,
+            "generated_at": now.isoformat(),
+            "expires_in_seconds": self.seconds_until_update(now),
+            "model_version": service.model_version,
+            "peak": {"timestamp": peak["timestamp"], "risk_score": peak["risk_score"]},
+            "curve": points
+        }
+        self.curves.set(key, curve, ttl=curve["expires_in_seconds"])
+        return {**curve, "cached": False}
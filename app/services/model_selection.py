@@ -0,0 +1,191 @@
+"""
+Offline model selection: time-ordered cross-validation over a hyperparameter
+grid, with the winning configuration trained on the full history and saved
+as a new model artifact.
+
+Usage:
+    python -m app.services.model_selection [--grid grid.json] [--splits 5] [--jobs -1]
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import average_precision_score, f1_score, roc_auc_score
+from sklearn.model_selection import ParameterGrid, TimeSeriesSplit
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
+
+from .prediction_service import DEFAULT_MODEL_PARAMS, PredictionService
+from ..utils.sampling import sample_training_rows
+
+load_dotenv()
+
+DEFAULT_PARAM_GRID = {
+    "n_estimators": [100, 200],
+    "max_depth": [None, 12, 20],
+    "min_samples_leaf": [1, 5],
+    "class_weight": [None, "balanced"]
+}
+
+
+def evaluate_fold(params: Dict, X: np.ndarray, y: np.ndarray,
+                  train_index: np.ndarray, test_index: np.ndarray,
+                  timestamps: np.ndarray = None, sampling: Dict = None) -> Dict:
+    """
+    Fit one configuration on one fold and score it on the following window.
+    With sampling (sample_training_rows arguments), the training fold is
+    sampled and weighted the way fit_forest samples the full history; the
+    test window is always scored in full.
+    """
+    # Each fold runs in its own worker, so nested BLAS/OpenMP pools stay at one thread
+    with threadpool_limits(limits=1):
+        model_params = {**DEFAULT_MODEL_PARAMS, **params}
+        sample_weight = None
+        if sampling is not None:
+            rows, sample_weight, _ = sample_training_rows(
+                y[train_index], timestamps[train_index], **sampling,
+                seed=model_params.get("random_state")
+            )
+            train_index = train_index[rows]
+
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X[train_index])
+        X_test = scaler.transform(X[test_index])
+        y_train, y_test = y[train_index], y[test_index]
+
+        start = time.perf_counter()
+        model = RandomForestClassifier(**model_params, n_jobs=1).fit(
+            X_train, y_train, sample_weight=sample_weight
+        )
+        fit_seconds = time.perf_counter() - start
+
+        if len(model.classes_) < 2:
+            scores = np.zeros(len(test_index))
+        else:
+            scores = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+
+    both_classes = len(np.unique(y_test)) == 2
+    return {
+        "roc_auc": float(roc_auc_score(y_test, scores)) if both_classes else None,
+        "average_precision": float(average_precision_score(y_test, scores)) if both_classes else None,
+        "f1": float(f1_score(y_test, scores >= 0.5, zero_division=0)),
+        "fit_seconds": fit_seconds
+    }
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    present = [value for value in values if value is not None]
+    return float(np.mean(present)) if present else None
+
+
+def cross_validate_grid(X: np.ndarray, y: np.ndarray, param_grid: Dict = None,
+                        n_splits: int = 5, n_jobs: int = -1,
+                        timestamps: np.ndarray = None, sampling: Dict = None) -> List[Dict]:
+    """
+    Evaluate every configuration in param_grid with TimeSeriesSplit over rows
+    already sorted by time, spreading (configuration, fold) pairs across cores.
+    Training folds are sampled with sampling when given (see evaluate_fold).
+    Returns the leaderboard, best mean average precision first.
+    """
+    configs = list(ParameterGrid(param_grid or DEFAULT_PARAM_GRID))
+    folds = list(TimeSeriesSplit(n_splits=n_splits).split(X))
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_fold)(params, X, y, train_index, test_index, timestamps, sampling)
+        for params, (train_index, test_index) in itertools.product(configs, folds)
+    )
+
+    leaderboard = []
+    for config_index, params in enumerate(configs):
+        fold_results = results[config_index * len(folds):(config_index + 1) * len(folds)]
+        leaderboard.append({
+            "params": params,
+            "average_precision": _mean([r["average_precision"] for r in fold_results]),
+            "roc_auc": _mean([r["roc_auc"] for r in fold_results]),
+            "f1": _mean([r["f1"] for r in fold_results]),
+            "fit_seconds": _mean([r["fit_seconds"] for r in fold_results]),
+            "folds": fold_results
+        })
+
+    leaderboard.sort(key=lambda entry: (
+        entry["average_precision"] if entry["average_precision"] is not None else -1.0,
+        entry["roc_auc"] if entry["roc_auc"] is not None else -1.0
+    ), reverse=True)
+    return leaderboard
+
+
+def run_model_selection(service: PredictionService, db, param_grid: Dict = None,
+                        n_splits: int = 5, n_jobs: int = -1) -> Optional[Dict]:
+    """
+    Cross-validate the grid on the training matrix train_model builds, then
+    train the winner on the full history and save it as a new artifact with
+    the leaderboard. Returns the selection summary, or None without data.
+    """
+    training_set = service.load_training_set(db)
+    if training_set is None or len(training_set["y"]) <= n_splits:
+        return None
+
+    # TimeSeriesSplit needs rows in time order; untimed rows go first
+    timestamps = training_set["timestamp"]
+    order = np.argsort(np.where(np.isnat(timestamps), np.datetime64(0, 'us'), timestamps), kind='stable')
+    # Folds are sampled like the final fit, so the leaderboard ranks what ships
+    leaderboard = cross_validate_grid(
+        training_set["X"][order], training_set["y"][order], param_grid, n_splits, n_jobs,
+        timestamps=timestamps[order], sampling=service.sampling_params()
+    )
+
+    best = leaderboard[0]
+    service.model_params = {**DEFAULT_MODEL_PARAMS, **best["params"]}
+    service.model_selection = {
+        "n_splits": n_splits,
+        "best_params": best["params"],
+        "leaderboard": [
+            {name: value for name, value in entry.items() if name != "folds"}
+            for entry in leaderboard
+        ]
+    }
+    if not service.train_model(db, training_set=training_set):
+        return None
+    return {**service.model_selection, "model_version": service.model_version}
+
+
+def main():
+    from ..utils.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Time-series cross-validated hyperparameter search")
+    parser.add_argument('--grid', help="JSON file mapping RandomForestClassifier params to value lists")
+    parser.add_argument('--splits', type=int, default=int(os.getenv('MODEL_SELECTION_SPLITS', '5')))
+    parser.add_argument('--jobs', type=int, default=int(os.getenv('MODEL_SELECTION_JOBS', '-1')))
+    args = parser.parse_args()
+
+    param_grid = None
+    if args.grid:
+        with open(args.grid) as grid_file:
+            param_grid = json.load(grid_file)
+
+    service = PredictionService()
+    service.load_artifact()
+    db = SessionLocal()
+    try:
+        summary = run_model_selection(service, db, param_grid, args.splits, args.jobs)
+    finally:
+        db.close()
+
+    if summary is None:
+        print("Not enough data for model selection")
+        return
+    for rank, entry in enumerate(summary["leaderboard"], start=1):
+        print(f"{rank:>3}  AP={entry['average_precision']}  AUC={entry['roc_auc']}  "
+              f"F1={entry['f1']:.3f}  {entry['params']}")
+    print(f"Saved model version {summary['model_version']} with {summary['best_params']}")
+
+
+if __name__ == '__main__':
+    main()
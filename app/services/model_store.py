@@ -0,0 +1,108 @@
+import os
+import re
+import shutil
+import joblib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+from ..utils.forest import CompiledForest
+
+load_dotenv()
+
+
+class ModelStore:
+    """Versioned on-disk store for fitted models and their scalers"""
+
+    ARTIFACT_PATTERN = re.compile(r'^model_v(\d+)\.joblib$')
+
+    def __init__(self, directory: str = None, keep_versions: int = None):
+        self.directory = Path(directory or os.getenv('MODEL_DIR', './model_artifacts'))
+        self.keep_versions = int(keep_versions or os.getenv('MODEL_KEEP_VERSIONS', '5'))
+
+    def path_for(self, version: int) -> Path:
+        return self.directory / f"model_v{version:06d}.joblib"
+
+    def compact_path_for(self, version: int) -> Path:
+        return self.directory / f"model_v{version:06d}.compact"
+
+    def list_versions(self) -> List[int]:
+        """Return stored versions, oldest first"""
+        if not self.directory.exists():
+            return []
+        versions = []
+        for path in self.directory.iterdir():
+            match = self.ARTIFACT_PATTERN.match(path.name)
+            if match:
+                versions.append(int(match.group(1)))
+        return sorted(versions)
+
+    def latest_version(self) -> Optional[int]:
+        versions = self.list_versions()
+        return versions[-1] if versions else None
+
+    def save(self, model, scaler, watermark: Dict, metrics: Dict, extra: Dict = None,
+             compact: CompiledForest = None, active_version: int = None) -> int:
+        """
+        Persist a fitted model and scaler as the next version and prune old
+        ones, never the active_version being served. A compact forest is
+        written next to it as memory-mappable arrays.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        version = (self.latest_version() or 0) + 1
+        artifact = {
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(),
+            "model": model,
+            "scaler": scaler,
+            "watermark": watermark,
+            "metrics": metrics,
+            **(extra or {})
+        }
+
+        # Write atomically so readers never see a partial artifact
+        if compact is not None:
+            compact_path = self.compact_path_for(version)
+            tmp_dir = compact_path.with_suffix('.compact-tmp')
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            compact.save(tmp_dir)
+            shutil.rmtree(compact_path, ignore_errors=True)
+            os.replace(tmp_dir, compact_path)
+
+        path = self.path_for(version)
+        tmp_path = path.with_suffix('.tmp')
+        joblib.dump(artifact, tmp_path)
+        os.replace(tmp_path, path)
+
+        self.prune(active_version)
+        return version
+
+    def load(self, version: int = None) -> Optional[Dict]:
+        """
+        Load a stored version, or the newest one when no version is given.
+        Its compact forest, if any, is memory-mapped under "compact".
+
+        Only the compact arrays are shared between worker processes: sklearn
+        trees copy their node arrays onto the heap when unpickled, so every
+        process that loads "model" holds its own copy of the full forest.
+        """
+        if version is None:
+            version = self.latest_version()
+        if version is None or not self.path_for(version).exists():
+            return None
+        artifact = joblib.load(self.path_for(version))
+        if self.compact_path_for(version).exists():
+            artifact["compact"] = CompiledForest.load(self.compact_path_for(version))
+        return artifact
+
+    def prune(self, active_version: int = None):
+        """Delete all but the newest keep_versions artifacts and the active one"""
+        for version in self.list_versions()[:-self.keep_versions]:
+            if version == active_version:
+                continue
+            try:
+                self.path_for(version).unlink()
+            except FileNotFoundError:
+                pass
+            shutil.rmtree(self.compact_path_for(version), ignore_errors=True)
@@ -1,107 +1,809 @@
+import os
+import weakref
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from datetime import datetime, timedelta
+from typing import Optional
 from sqlalchemy.orm import Session
 from ..models.database import WeatherRecord, NetworkOutage, School
+from .model_store import ModelStore
+from .region_models import RegionModelCache, region_key
+from .feature_store import FeatureStore, ROLLING_FEATURES
+from .drift_monitor import DriftMonitor, build_reference
+from .shadow_evaluator import ShadowEvaluator
+from ..utils.cache import TTLCache
+from ..utils.forest import CompiledForest, average_tree_proba, sklearn_forest_nbytes
+from ..utils.sampling import CLASS_WEIGHTINGS, balance_classes, sample_training_rows
+from ..utils.training_data import load_weather_arrays, load_outage_arrays, take_rows, concat_rows
+from ..utils.labeling import OUTAGE_WINDOW, label_outage_windows, label_outage_windows_spatial
+
+FEATURES = [
+    'temperature', 'humidity', 'wind_speed',
+    'rain_last_hour', 'clouds'
+]
+
+DEFAULT_MODEL_PARAMS = {"n_estimators": 100, "random_state": 42}
+
+# Default quantization step per feature for the prediction cache key
+CACHE_STEPS = {
+    'temperature': 0.5, 'humidity': 1.0, 'wind_speed': 0.5,
+    'rain_last_hour': 0.1, 'clouds': 5.0,
+    'max_wind_6h': 0.5, 'max_wind_24h': 0.5,
+    'rain_6h': 0.5, 'rain_24h': 0.5, 'humidity_trend_6h': 0.5
+}
+
+# Define risk levels
+RISK_LEVELS = {
+    (0.0, 0.3): "Low risk of network outage",
+    (0.3, 0.7): "Moderate risk of network outage",
+    (0.7, 1.0): "High risk of network outage"
+}
+# Scores on the same side of every edge share a risk level
+RISK_LEVEL_EDGES = [lower for lower, _ in sorted(RISK_LEVELS)][1:]
+
+
+def risk_message(risk_prob: float) -> str:
+    """Map a risk probability onto its risk level message"""
+    for (lower, upper), message in RISK_LEVELS.items():
+        if lower <= risk_prob < upper:
+            return message
+    return RISK_LEVELS[(0.7, 1.0)]
+
 
 class PredictionService:
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+    def __init__(self, labeling_mode: str = None, label_radius_km: float = None,
+                 inference_engine: str = None):
+        # Forest settings for full retrains; replaced by the winner of a
+        # model selection run when its artifact is loaded
+        self.model_params = dict(DEFAULT_MODEL_PARAMS)
+        self.model_selection = None
+        self.model = RandomForestClassifier(**self.model_params)
         self.scaler = StandardScaler()
         self.is_trained = False
 
+        # Highest WeatherRecord / NetworkOutage ids already consumed by training
+        self.weather_watermark = 0
+        self.outage_watermark = 0
+
+        # Trees added per incremental update, and the forest size at which an
+        # incremental update falls back to a full retrain
+        self.incremental_estimators = int(os.getenv('INCREMENTAL_ESTIMATORS', '10'))
+        self.max_estimators = int(os.getenv('MAX_ESTIMATORS', '500'))
+
+        # Versioned artifacts so a restart can serve the last model immediately
+        self.model_store = ModelStore()
+        self.model_version = None
+        self.metrics = {}
+
+        # "global" counts an outage at any school, "spatial" only outages at
+        # schools within label_radius_km of the weather observation
+        self.labeling_mode = labeling_mode or os.getenv('LABELING_MODE', 'global')
+        self.label_radius_km = float(
+            label_radius_km or os.getenv('LABEL_RADIUS_KM', '25')
+        )
+        if self.labeling_mode not in ('global', 'spatial'):
+            raise ValueError(f"Unknown labeling mode: {self.labeling_mode}")
+
+        # "sklearn" scores with model.predict_proba, "numpy" with the forest
+        # flattened into arrays, which skips per-call validation and dispatch,
+        # and "compact" with the depth-bounded float32 copy of the forest
+        self.inference_engine = inference_engine or os.getenv('INFERENCE_ENGINE', 'sklearn')
+        if self.inference_engine not in ('sklearn', 'numpy', 'compact'):
+            raise ValueError(f"Unknown inference engine: {self.inference_engine}")
+        self._compiled = weakref.WeakKeyDictionary()
+
+        # Compact forests are stored with every artifact; the bounds cap how
+        # deep and wide each tree may grow before it is cut
+        self.compact_models = os.getenv('COMPACT_MODELS', 'true').lower() == 'true'
+        self.compact_max_depth = int(os.getenv('COMPACT_MAX_DEPTH', '16'))
+        self.compact_max_leaf_nodes = int(os.getenv('COMPACT_MAX_LEAF_NODES', '4096'))
+        # Rows left out of each fit to measure what the cut costs, at most a
+        # tenth of the data
+        self.compact_holdout_rows = int(os.getenv('COMPACT_HOLDOUT_ROWS', '2000'))
+
+        # Rows kept for a full fit: any of "stratified", "decay" and "cap"
+        # (see utils.sampling), with a hard TRAINING_MAX_ROWS budget when set
+        self.sampling_strategies = [
+            name.strip() for name in os.getenv('TRAINING_SAMPLING', '').split(',') if name.strip()
+        ]
+        self.max_training_rows = int(os.getenv('TRAINING_MAX_ROWS', '0'))
+        self.negative_ratio = float(os.getenv('TRAINING_NEGATIVE_RATIO', '10'))
+        self.sample_half_life_days = float(os.getenv('TRAINING_HALF_LIFE_DAYS', '90'))
+        # "balanced" weights outages and quiet rows equally; "history" keeps
+        # the source outage rate
+        self.class_weighting = os.getenv('TRAINING_CLASS_WEIGHTING', 'balanced')
+        if self.class_weighting not in CLASS_WEIGHTINGS:
+            raise ValueError(f"Unknown class weighting: {self.class_weighting}")
+
+        # Per-region models for grid cells with enough history; other cells
+        # use the global model
+        self.region_models = RegionModelCache()
+        self.region_min_samples = int(os.getenv('REGION_MIN_SAMPLES', '500'))
+        # Region models are fitted like the global one; a positive
+        # REGION_ESTIMATORS only overrides their tree count
+        self.region_estimators = int(os.getenv('REGION_ESTIMATORS', '0'))
+
+        # Predictions memoized on the quantized feature vector and the model
+        # that produced them. Opt-in, since cached rows are scored on snapped
+        # features; metrics["cache_quantization"] shows how far that moves
+        # scores. A size of 0 disables the cache
+        self.prediction_cache = TTLCache(
+            max_size=int(os.getenv('PREDICTION_CACHE_SIZE', '0')),
+            ttl=float(os.getenv('PREDICTION_CACHE_TTL', '300'))
+        )
+        # Overrides as "name=step,name=step"
+        self.cache_steps = dict(CACHE_STEPS)
+        for item in filter(None, os.getenv('PREDICTION_CACHE_STEPS', '').split(',')):
+            name, step = item.split('=')
+            self.cache_steps[name.strip()] = float(step)
+
+        # Rolling-window aggregates materialized per location; models trained
+        # with them read the same aggregates at prediction time
+        self.feature_store = FeatureStore()
+        self.use_feature_store = os.getenv('USE_FEATURE_STORE', 'true').lower() == 'true'
+        self.feature_names = list(FEATURES)
+
+        # Training feature distribution stored with each artifact, and the
+        # live inputs and scores counted against it
+        self.drift_bins = int(os.getenv('DRIFT_BINS', '10'))
+        self.drift_reference = None
+        self.drift_monitor = DriftMonitor()
+
+        # Candidate model scored on a copy of live traffic in the background
+        self.shadow = ShadowEvaluator(self, level_edges=RISK_LEVEL_EDGES)
+
+    def training_features(self) -> list:
+        """Feature names the next full training run will use"""
+        return FEATURES + ROLLING_FEATURES if self.use_feature_store else list(FEATURES)
+
     def prepare_features(self, weather_data):
         """Convert weather data into ML features"""
-        features = [
-            'temperature', 'humidity', 'wind_speed',
-            'rain_last_hour', 'clouds'
-        ]
-        
         return np.array([
-            weather_data.get(f, 0) for f in features
+            weather_data.get(f, 0) for f in self.feature_names
         ]).reshape(1, -1)
 
-    def train_model(self, db: Session):
-        """Train the model using historical data"""
-        # Get historical data
-        weather_records = db.query(WeatherRecord).all()
-        outages = db.query(NetworkOutage).all()
-        
-        if not weather_records or not outages:
-            return False
+    def prepare_features_batch(self, weather_list, feature_names: list = None) -> np.ndarray:
+        """Convert many weather dicts into one feature matrix, one row each"""
+        feature_names = feature_names or self.feature_names
+        return np.array([
+            [weather_data.get(f, 0) for f in feature_names]
+            for weather_data in weather_list
+        ], dtype=float).reshape(-1, len(feature_names))
+
+    def load_training_set(self, db: Session) -> Optional[dict]:
+        """
+        Load and label the full history for training. Returns None when there
+        is not enough data, otherwise a dict with the raw feature matrix "X",
+        labels "y", record "timestamp"s and coordinates, the "outages" arrays
+        they were labeled against, "feature_names" and the watermarks.
+        """
+        # Get historical data as column arrays, streamed in chunks
+        feature_names = self.training_features()
+        if self.use_feature_store:
+            self.feature_store.backfill(db)
+        weather = load_weather_arrays(db, feature_names)
+        outages = load_outage_arrays(db)
         
-        # Prepare training data
-        X = []
-        y = []
+        if not len(weather["id"]) or not len(outages["id"]):
+            return None
         
-        for weather in weather_records:
-            # Create feature vector
-            features = [
-                weather.temperature,
-                weather.humidity,
-                weather.wind_speed,
-                weather.rain_last_hour,
-                weather.clouds
-            ]
-            
-            # Check if there was an outage within 6 hours of this weather record
-            outage_occurred = any(
-                abs((outage.start_time - weather.timestamp).total_seconds()) <= 21600
-                for outage in outages
-            )
-            
-            X.append(features)
-            y.append(1 if outage_occurred else 0)
+        # Label records with an outage within 6 hours of the observation
+        y = self.label_records(db, weather, outages)
         
-        if len(X) < 10:  # Need minimum amount of data
+        if len(y) < 10:  # Need minimum amount of data
+            return None
+
+        return {
+            "X": weather["features"],
+            "y": y,
+            "timestamp": weather["timestamp"],
+            "latitude": weather["latitude"],
+            "longitude": weather["longitude"],
+            "outages": outages,
+            "feature_names": feature_names,
+            "weather_watermark": int(weather["id"].max()),
+            "outage_watermark": int(outages["id"].max())
+        }
+
+    def train_model(self, db: Session, incremental: bool = False, training_set: dict = None):
+        """Train the model using historical data"""
+        if incremental and self.is_trained:
+            return self.update_model(db)
+
+        training_set = training_set or self.load_training_set(db)
+        if training_set is None:
             return False
-        
-        # Convert to numpy arrays
-        X = np.array(X)
-        y = np.array(y)
-        
+
+        holdout = self.compaction_holdout(len(training_set["y"]))
+        model, scaler, X, y, sampling = self.fit_forest(
+            training_set["X"], training_set["y"], training_set["timestamp"], holdout=holdout
+        )
+        self.model, self.scaler = model, scaler
+        self.feature_names = training_set["feature_names"]
+        self.drift_reference = build_reference(training_set["X"], self.feature_names, self.drift_bins)
+        self.is_trained = True
+
+        self.weather_watermark = training_set["weather_watermark"]
+        self.outage_watermark = training_set["outage_watermark"]
+        metrics = self.training_metrics(X, y, mode='full')
+        metrics["sampling"] = sampling
+        metrics["cache_quantization"] = self.cache_quantization_metrics(training_set["X"])
+        X_holdout = scaler.transform(training_set["X"][holdout]) if len(holdout) else X[:0]
+        self.save_artifact(metrics, self.compact_forest(X_holdout, training_set["y"][holdout], metrics))
+        return True
+
+    def compaction_holdout(self, n_rows: int) -> np.ndarray:
+        """Sorted indices of the rows to keep out of a fit for compact_forest"""
+        if not self.compact_models:
+            return np.array([], dtype=np.int64)
+        size = min(self.compact_holdout_rows, n_rows // 10)
+        rng = np.random.default_rng(self.model_params.get("random_state"))
+        return np.sort(rng.choice(n_rows, size, replace=False))
+
+    def fit_forest(self, X: np.ndarray, y: np.ndarray, timestamps: np.ndarray,
+                   holdout: np.ndarray = None, **params):
+        """
+        Sample, scale and fit a forest on raw features with the current model
+        params (overridden by params), leaving out any holdout rows. Returns
+        the fitted model and scaler, the scaled rows and labels it was fitted
+        on, and the sampling summary.
+        """
+        # Bound the fit to a fixed row budget and rebalance the classes
+        rows, sample_weight, sampling = sample_training_rows(
+            y, timestamps, **self.sampling_params(),
+            seed=self.model_params.get("random_state")
+        )
+        if holdout is not None and len(holdout):
+            fitted = ~np.isin(rows, holdout)
+            rows, sample_weight = rows[fitted], sample_weight[fitted]
+
         # Scale features
-        X = self.scaler.fit_transform(X)
-        
+        scaler = StandardScaler()
+        X = scaler.fit_transform(X[rows])
+        y = y[rows]
+
         # Train model
-        self.model.fit(X, y)
+        model = RandomForestClassifier(**{**self.model_params, **params})
+        model.fit(X, y, sample_weight=sample_weight)
+        return model, scaler, X, y, sampling
+
+    def sampling_params(self) -> dict:
+        """Arguments for sample_training_rows, besides labels, timestamps and seed"""
+        return {
+            "strategies": self.sampling_strategies,
+            "max_rows": self.max_training_rows,
+            "negative_ratio": self.negative_ratio,
+            "half_life_days": self.sample_half_life_days,
+            "weighting": self.class_weighting
+        }
+
+    def update_model(self, db: Session):
+        """
+        Grow the forest with trees fitted on data added since the last run.
+
+        Only weather records and outages above the watermarks are fetched, plus
+        older weather records that fall inside the window of a new outage since
+        their label may have changed. The scaler is kept as fitted by the last
+        full retrain so existing trees stay valid.
+        """
+        # Keep the features the served model was trained on
+        if any(name in ROLLING_FEATURES for name in self.feature_names):
+            self.feature_store.backfill(db, after_id=self.weather_watermark)
+        new_weather = load_weather_arrays(
+            db, self.feature_names, WeatherRecord.id > self.weather_watermark
+        )
+        new_outages = load_outage_arrays(
+            db, NetworkOutage.id > self.outage_watermark
+        )
+
+        if not len(new_weather["id"]) and not len(new_outages["id"]):
+            return True
+
+        # The compact engine serves a cut-down copy; trees are added to the
+        # stored full forest
+        model = self.model
+        if isinstance(model, CompiledForest):
+            artifact = self.model_store.load(self.model_version)
+            if artifact is None:
+                return self.train_model(db)
+            model = artifact["model"]
+
+        if model.n_estimators + self.incremental_estimators > self.max_estimators:
+            return self.train_model(db)
+
+        # Older records that a new outage may have relabeled
+        weather = new_weather
+        if len(new_outages["id"]):
+            outage_starts = new_outages["start_time"]
+            candidates = load_weather_arrays(
+                db, self.feature_names,
+                WeatherRecord.id <= self.weather_watermark,
+                WeatherRecord.timestamp >= outage_starts.min().item() - OUTAGE_WINDOW,
+                WeatherRecord.timestamp <= outage_starts.max().item() + OUTAGE_WINDOW
+            )
+            near = label_outage_windows(candidates["timestamp"], outage_starts)
+            weather = concat_rows(new_weather, take_rows(candidates, near == 1))
+
+        if len(weather["id"]) < 10:  # Wait until the batch is large enough
+            return False
+
+        # Label the batch against every outage that can reach it
+        timestamps = weather["timestamp"]
+        outages = load_outage_arrays(
+            db,
+            NetworkOutage.start_time >= timestamps.min().item() - OUTAGE_WINDOW,
+            NetworkOutage.start_time <= timestamps.max().item() + OUTAGE_WINDOW
+        )
+
+        X = self.scaler.transform(weather["features"])
+        y = self.label_records(db, weather, outages)
+        fitted = np.ones(len(y), dtype=bool)
+        fitted[self.compaction_holdout(len(y))] = False
+        X, X_holdout, y, y_holdout = X[fitted], X[~fitted], y[fitted], y[~fitted]
+
+        # Warm-started trees must see every class the forest already knows
+        if len(np.unique(y)) < len(model.classes_):
+            return False
+
+        model.set_params(
+            warm_start=True,
+            n_estimators=model.n_estimators + self.incremental_estimators
+        )
+        # New trees see the classes weighted as the full fit did
+        sample_weight = balance_classes(y, np.ones(len(y))) if self.class_weighting == 'balanced' else None
+        model.fit(X, y, sample_weight=sample_weight)
+        self.model = model
+
+        if len(new_weather["id"]):
+            self.weather_watermark = int(new_weather["id"].max())
+        if len(new_outages["id"]):
+            self.outage_watermark = int(new_outages["id"].max())
+        metrics = self.training_metrics(X, y, mode='incremental')
+        metrics["cache_quantization"] = self.cache_quantization_metrics(weather["features"])
+        self.save_artifact(metrics, self.compact_forest(X_holdout, y_holdout, metrics))
+        return True
+
+    def training_metrics(self, X: np.ndarray, y: np.ndarray, mode: str) -> dict:
+        """Summarize a fit for storage alongside the model artifact"""
+        return {
+            "mode": mode,
+            "n_samples": int(len(y)),
+            "positive_rate": float(np.mean(y)),
+            "n_estimators": int(self.model.n_estimators),
+            "train_accuracy": float(self.model.score(X, y))
+        }
+
+    def cache_quantization_metrics(self, features: np.ndarray, sample_size: int = 2000) -> dict:
+        """
+        How far snapping raw feature rows to the cache_steps grid moves the
+        current model's risk scores, on a sample of up to sample_size rows.
+        """
+        rng = np.random.default_rng(0)
+        if len(features) > sample_size:
+            features = features[rng.choice(len(features), sample_size, replace=False)]
+        raw, classes = self.predict_proba(features)
+        snapped, _ = self.predict_proba(self.quantize(features, self.feature_names))
+        positive = list(classes).index(1) if 1 in classes else None
+        if positive is None or not len(features):
+            diff = np.zeros(len(features))
+            changed = np.zeros(len(features), dtype=bool)
+        else:
+            diff = np.abs(snapped[:, positive] - raw[:, positive])
+            changed = (np.searchsorted(RISK_LEVEL_EDGES, snapped[:, positive], side='right')
+                       != np.searchsorted(RISK_LEVEL_EDGES, raw[:, positive], side='right'))
+        return {
+            "steps": {name: self.cache_steps.get(name, 1.0) for name in self.feature_names},
+            "n_rows": int(len(features)),
+            "mean_abs_diff": float(diff.mean()) if len(diff) else 0.0,
+            "max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+            "level_change_rate": float(changed.mean()) if len(changed) else 0.0
+        }
+
+    def compact_forest(self, X: np.ndarray, y: np.ndarray, metrics: dict) -> Optional[CompiledForest]:
+        """
+        Build the compact copy of the current forest and record in metrics
+        how much smaller it is and how both forests score the held-out
+        (scaled) rows X, y that neither was fitted on.
+        """
+        if not self.compact_models:
+            return None
+        compact = CompiledForest.from_sklearn(
+            self.model, max_depth=self.compact_max_depth,
+            max_leaf_nodes=self.compact_max_leaf_nodes, compact=True
+        )
+        metrics["compaction"] = {
+            "max_depth": self.compact_max_depth,
+            "max_leaf_nodes": self.compact_max_leaf_nodes,
+            "full_bytes": sklearn_forest_nbytes(self.model),
+            "compact_bytes": compact.nbytes,
+            "holdout_rows": int(len(y))
+        }
+        if not len(y):
+            return compact
+        full_proba = self.model.predict_proba(X)
+        compact_proba = compact.predict_proba(X)
+        full_pred = self.model.classes_[full_proba.argmax(axis=1)]
+        compact_pred = compact.classes_[compact_proba.argmax(axis=1)]
+        diff = np.abs(full_proba - compact_proba)
+        metrics["compaction"].update({
+            "full_accuracy": float(np.mean(full_pred == y)),
+            "compact_accuracy": float(np.mean(compact_pred == y)),
+            "agreement": float(np.mean(full_pred == compact_pred)),
+            "mean_proba_diff": float(diff.mean()),
+            "max_proba_diff": float(diff.max())
+        })
+        return compact
+
+    def save_artifact(self, metrics: dict, compact: CompiledForest = None):
+        """Persist the current model, scaler and watermark as a new version"""
+        self.metrics = metrics
+        self.model_version = self.model_store.save(
+            self.model,
+            self.scaler,
+            watermark={
+                "weather_record_id": self.weather_watermark,
+                "network_outage_id": self.outage_watermark
+            },
+            metrics=metrics,
+            extra={
+                "features": self.feature_names,
+                "model_params": self.model_params,
+                "model_selection": self.model_selection,
+                "drift_reference": self.drift_reference
+            },
+            compact=compact,
+            active_version=self.model_version
+        )
+        # Serve the compact copy as apply_artifact would; the full forest
+        # stays in the store for the next incremental update
+        if self.inference_engine == 'compact' and compact is not None:
+            self.model = compact
+        self.prediction_cache.clear()
+        self.drift_monitor.reset(self.drift_reference, self.model_version)
+        return self.model_version
+
+    def load_artifact(self, version: int = None) -> bool:
+        """Load a stored model version, the newest by default"""
+        artifact = self.model_store.load(version)
+        if artifact is None:
+            return False
+        self.apply_artifact(artifact)
+        return True
+
+    def apply_artifact(self, artifact: dict):
+        """
+        Swap a loaded artifact in as the active model.
+
+        Only plain attribute assignments happen here, so when called from the
+        event loop no prediction can observe a half-swapped model and scaler.
+        The compact engine serves the stored compact forest and lets the full
+        forest be freed.
+        """
+        if self.inference_engine == 'compact' and artifact.get("compact") is not None:
+            self.model = artifact["compact"]
+        else:
+            self.model = artifact["model"]
+        self.scaler = artifact["scaler"]
+        self.weather_watermark = artifact["watermark"]["weather_record_id"]
+        self.outage_watermark = artifact["watermark"]["network_outage_id"]
+        self.metrics = artifact["metrics"]
+        self.model_version = artifact["version"]
+        self.feature_names = list(artifact.get("features") or FEATURES)
+        self.model_params = dict(artifact.get("model_params") or DEFAULT_MODEL_PARAMS)
+        self.model_selection = artifact.get("model_selection")
+        self.drift_reference = artifact.get("drift_reference")
         self.is_trained = True
+        self.prediction_cache.clear()
+        self.drift_monitor.reset(self.drift_reference, self.model_version)
+
+    def start_shadow(self, version: int) -> bool:
+        """Shadow the global model with a stored model version"""
+        artifact = self.model_store.load(version)
+        if artifact is None:
+            return False
+        self.shadow.start(artifact)
         return True
 
-    def predict_outage_risk(self, weather_data: dict) -> dict:
-        """Predict the risk of an outage based on weather conditions"""
-        if not self.is_trained:
-            return {
-                "risk_score": 0.5,  # Default medium risk
-                "confidence": 0.0,
-                "message": "Model not yet trained - insufficient data"
-            }
-        
-        # Prepare features
-        features = self.prepare_features(weather_data)
-        features_scaled = self.scaler.transform(features)
-        
-        # Get prediction probability
-        risk_prob = self.model.predict_proba(features_scaled)[0][1]
-        
-        # Define risk levels
-        risk_message = {
-            (0.0, 0.3): "Low risk of network outage",
-            (0.3, 0.7): "Moderate risk of network outage",
-            (0.7, 1.0): "High risk of network outage"
+    def stop_shadow(self):
+        self.shadow.stop()
+
+    def train_region_models(self, db: Session) -> dict:
+        """
+        Fit one model per grid cell with at least region_min_samples records
+        and both classes present, and drop stored models for other cells.
+        Models are fitted through fit_forest, with the global model params
+        and sampling. Under global labeling a cell's records are labeled only
+        against outages at schools inside the cell; spatial labels are
+        already local. Returns the training metrics of each region model by
+        region key.
+        """
+        feature_names = self.training_features()
+        if self.use_feature_store:
+            self.feature_store.backfill(db)
+        weather = load_weather_arrays(db, feature_names)
+        outages = load_outage_arrays(db)
+        if not len(weather["id"]) or not len(outages["id"]):
+            return {}
+
+        # Grid cell of the school behind each outage
+        cell_deg = self.region_models.cell_deg
+        school_cells = {
+            school.id: region_key(school.latitude, school.longitude, cell_deg)
+            for school in db.query(School.id, School.latitude, School.longitude).all()
         }
-        
-        # Get appropriate message
-        for (lower, upper), message in risk_message.items():
-            if lower <= risk_prob < upper:
-                status_message = message
-                break
-        
+        outage_cells = np.array([
+            school_cells.get(int(school_id)) if not np.isnan(school_id) else None
+            for school_id in outages["school_id"]
+        ], dtype=object)
+        labels = self.label_records(db, weather, outages) if self.labeling_mode == 'spatial' else None
+        params = {"n_estimators": self.region_estimators} if self.region_estimators > 0 else {}
+
+        # Group rows by grid cell without a per-row Python loop
+        located = ~np.isnan(weather["latitude"]) & ~np.isnan(weather["longitude"])
+        rows = np.flatnonzero(located)
+        cells = np.column_stack((
+            np.floor(weather["latitude"][rows] / cell_deg),
+            np.floor(weather["longitude"][rows] / cell_deg)
+        )).astype(np.int64)
+        unique_cells, inverse, counts = np.unique(
+            cells, axis=0, return_inverse=True, return_counts=True
+        )
+        inverse = inverse.reshape(-1)
+
+        trained = {}
+        for cell_index in np.flatnonzero(counts >= self.region_min_samples):
+            cell_rows = rows[inverse == cell_index]
+            key = f"{unique_cells[cell_index][0]}_{unique_cells[cell_index][1]}"
+            if labels is not None:
+                y_cell = labels[cell_rows]
+            else:
+                y_cell = label_outage_windows(
+                    weather["timestamp"][cell_rows], outages["start_time"][outage_cells == key]
+                )
+            if len(np.unique(y_cell)) < 2:
+                continue
+
+            model, scaler, X_cell, y_cell, sampling = self.fit_forest(
+                weather["features"][cell_rows], y_cell, weather["timestamp"][cell_rows], **params
+            )
+
+            metrics = {
+                "mode": "region",
+                "region": key,
+                "n_samples": int(len(y_cell)),
+                "positive_rate": float(np.mean(y_cell)),
+                "n_estimators": int(model.n_estimators),
+                "train_accuracy": float(model.score(X_cell, y_cell)),
+                "sampling": sampling
+            }
+            self.region_models.save(key, model, scaler, metrics, features=feature_names)
+            trained[key] = metrics
+
+        self.region_models.remove_except(list(trained))
+        self.prediction_cache.clear()
+        return trained
+
+    def label_records(self, db: Session, weather: dict, outages: dict) -> np.ndarray:
+        """Label weather arrays against outage arrays using the configured labeling mode"""
+        if self.labeling_mode == 'global':
+            return label_outage_windows(weather["timestamp"], outages["start_time"])
+
+        schools = db.query(School.id, School.latitude, School.longitude).all()
+        return label_outage_windows_spatial(
+            weather["timestamp"],
+            weather["latitude"],
+            weather["longitude"],
+            outages["start_time"],
+            outages["school_id"],
+            [school.id for school in schools],
+            [school.latitude for school in schools],
+            [school.longitude for school in schools],
+            radius_km=self.label_radius_km
+        )
+
+    def untrained_prediction(self) -> dict:
         return {
-            "risk_score": float(risk_prob),
-            "confidence": float(self.model.score(features_scaled, [0])),  # Simple confidence score
-            "message": status_message
-        }
\ No newline at end of file
+            "risk_score": 0.5,  # Default medium risk
+            "confidence": 0.0,
+            "uncertainty": 0.5,
+            "risk_interval": [0.0, 1.0],
+            "message": "Model not yet trained - insufficient data"
+        }
+
+    def predict_outage_risk(self, weather_data: dict, location: tuple = None) -> dict:
+        """
+        Predict the risk of an outage based on weather conditions, using the
+        region model for location (latitude, longitude) when one exists
+        """
+        return self.predict_outage_risk_batch(
+            [weather_data], [location] if location else None
+        )[0]
+
+    def compiled_forest(self, model=None) -> CompiledForest:
+        """Return the flattened forest for a model, compiling it on first use"""
+        model = model if model is not None else self.model
+        if isinstance(model, CompiledForest):
+            return model
+        compiled = self._compiled.get(model)
+        if compiled is None or compiled.n_trees != len(model.estimators_):
+            if self.inference_engine == 'compact':
+                compiled = CompiledForest.from_sklearn(
+                    model, max_depth=self.compact_max_depth,
+                    max_leaf_nodes=self.compact_max_leaf_nodes, compact=True
+                )
+            else:
+                compiled = CompiledForest.from_sklearn(model)
+            self._compiled[model] = compiled
+        return compiled
+
+    def predict_tree_proba(self, features: np.ndarray, model=None, scaler=None):
+        """
+        Scale a feature matrix and return per-tree class probabilities,
+        shape (n_trees, n_rows, n_classes), using the configured engine.
+        Defaults to the active global model and scaler.
+        """
+        if model is None:
+            # Read the model and scaler once so a hot-swap cannot split the call
+            model, scaler = self.model, self.scaler
+
+        if self.inference_engine != 'sklearn' or isinstance(model, CompiledForest):
+            features_scaled = (np.asarray(features, dtype=np.float64) - scaler.mean_) / scaler.scale_
+            compiled = self.compiled_forest(model)
+            return compiled.tree_proba(features_scaled), compiled.classes_
+
+        # Validate once, then call the trees directly as the forest itself does
+        features_scaled = scaler.transform(features).astype(np.float32)
+        per_tree = np.stack([
+            estimator.predict_proba(features_scaled, check_input=False)
+            for estimator in model.estimators_
+        ])
+        return per_tree, model.classes_
+
+    def predict_proba(self, features: np.ndarray, model=None, scaler=None):
+        """Scale a feature matrix and score it with the configured engine"""
+        per_tree, classes = self.predict_tree_proba(features, model, scaler)
+        return average_tree_proba(per_tree), classes
+
+    def predict_outage_risk_batch(self, weather_list, locations=None, live: bool = True) -> list:
+        """
+        Predict outage risk for many weather observations, one model call per
+        model involved. With locations, rows are routed to their region model
+        and fall back to the global model for regions without one. Only live
+        observations are counted by the drift monitor and copied to the
+        shadow model; pass live=False for forecast steps.
+        """
+        if not weather_list:
+            return []
+
+        # Group rows by the model that scores them
+        model, scaler, feature_names = self.model, self.scaler, self.feature_names
+        groups = {}
+        region_for_key = {}
+        for row, location in enumerate(locations or [None] * len(weather_list)):
+            key = self.region_models.key_for(*location) if location else None
+            if key not in region_for_key:
+                artifact = self.region_models.get(key)
+                if artifact is None:
+                    region_for_key[key] = "global"
+                    groups.setdefault("global", (
+                        model, scaler, feature_names, self.model_version, []
+                    ))
+                else:
+                    region_for_key[key] = key
+                    groups[key] = (
+                        artifact["model"], artifact["scaler"],
+                        list(artifact.get("features") or FEATURES),
+                        (artifact["version"], artifact["created_at"]), []
+                    )
+            groups[region_for_key[key]][4].append(row)
+
+        results = [None] * len(weather_list)
+        for region, (group_model, group_scaler, group_features, version, rows) in groups.items():
+            if region == "global" and not self.is_trained:
+                predictions = [self.untrained_prediction() for _ in rows]
+            else:
+                features = self.prepare_features_batch(
+                    [weather_list[row] for row in rows], group_features
+                )
+                predictions = self.score_rows_cached(
+                    features, group_model, group_scaler, group_features, region, version
+                )
+                if live:
+                    self.monitor_scores(
+                        [weather_list[row] for row in rows], features, predictions,
+                        (group_model, group_scaler, group_features), region, version
+                    )
+            for row, prediction in zip(rows, predictions):
+                results[row] = prediction
+        return results
+
+    def quantize(self, features: np.ndarray, feature_names: list) -> np.ndarray:
+        """Snap feature rows to the prediction cache grid"""
+        steps = np.array([self.cache_steps.get(name, 1.0) for name in feature_names])
+        return np.round(features / steps) * steps
+
+    def monitor_scores(self, weather_list: list, features: np.ndarray, predictions: list,
+                       scored_by: tuple, region: str, version):
+        """
+        Count live rows scored by the global model for drift and copy them to
+        the shadow model, with the (model, scaler, feature names) that scored
+        them. The drift reference comes from the global fit, so region model
+        scores are left out of both.
+        """
+        if region != "global":
+            return
+        if self.drift_reference and scored_by[2] == self.drift_reference["features"]:
+            scores = np.array([prediction["risk_score"] for prediction in predictions])
+            self.drift_monitor.observe(features, scores)
+        if self.shadow.active:
+            self.shadow.submit(weather_list, scored_by, version)
+
+    def score_rows_cached(self, features: np.ndarray, model, scaler, feature_names: list,
+                          region: str, version) -> list:
+        """
+        Score rows through the prediction cache.
+
+        Features are snapped to the cache_steps grid and scored there, so every
+        observation in the same bucket gets the same answer whether or not it
+        was cached. Keys include the region and model version, so entries from
+        a replaced model can never be served.
+        """
+        if self.prediction_cache.max_size <= 0:
+            return self.score_rows(features, model, scaler, region)
+
+        quantized = self.quantize(features, feature_names)
+        keys = [
+            (region, version, tuple(None if np.isnan(value) else float(value) for value in row))
+            for row in quantized
+        ]
+
+        predictions = [self.prediction_cache.get(key) for key in keys]
+        missing = [row for row, prediction in enumerate(predictions) if prediction is None]
+        if missing:
+            scored = self.score_rows(quantized[missing], model, scaler, region)
+            for row, prediction in zip(missing, scored):
+                self.prediction_cache.set(keys[row], prediction)
+                predictions[row] = prediction
+
+        # Hand out copies so callers can annotate results without touching the cache
+        return [
+            {**prediction, "risk_interval": list(prediction["risk_interval"])}
+            for prediction in predictions
+        ]
+
+    def score_rows(self, features: np.ndarray, model, scaler, region: str) -> list:
+        """
+        Score a feature matrix with one model.
+
+        Uncertainty comes from the same forest pass: the spread of the
+        individual trees' outage probabilities. Confidence is 1 minus twice
+        their standard deviation (0 when trees are split evenly between 0
+        and 1, 1 when they all agree), and risk_interval spans the 10th to
+        90th percentile of tree outputs.
+        """
+        per_tree, classes = self.predict_tree_proba(features, model, scaler)
+        positive = int(np.flatnonzero(classes == 1)[0]) if 1 in classes else None
+
+        if positive is None:
+            tree_risk = np.zeros(per_tree.shape[:2])
+            risk_probs = np.zeros(per_tree.shape[1])
+        else:
+            tree_risk = per_tree[:, :, positive]
+            risk_probs = average_tree_proba(per_tree)[:, positive]
+
+        uncertainty = tree_risk.std(axis=0)
+        lower, upper = np.percentile(tree_risk, [10, 90], axis=0)
+
+        return [
+            {
+                "risk_score": float(risk_prob),
+                "confidence": float(1.0 - 2.0 * spread),
+                "uncertainty": float(spread),
+                "risk_interval": [float(low), float(high)],
+                "message": risk_message(risk_prob),
+                "model_region": region
+            }
+            for risk_prob, spread, low, high in zip(risk_probs, uncertainty, lower, upper)
+        ]
@@ -0,0 +1,125 @@
+import math
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+from .model_store import ModelStore
+
+load_dotenv()
+
+REGION_KEY_PATTERN = re.compile(r'^-?\d+_-?\d+$')
+
+
+def region_key(latitude: float, longitude: float, cell_deg: float) -> Optional[str]:
+    """Grid-cell key for a coordinate, e.g. "6_3" for the 1 degree cell at 6N 3E"""
+    if latitude is None or longitude is None:
+        return None
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        return None
+    return f"{math.floor(latitude / cell_deg)}_{math.floor(longitude / cell_deg)}"
+
+
+def cell_center(latitude: float, longitude: float, cell_deg: float) -> tuple:
+    """Centre (latitude, longitude) of the grid cell region_key puts a coordinate in"""
+    return tuple(
+        round((math.floor(value / cell_deg) + 0.5) * cell_deg, 6)
+        for value in (latitude, longitude)
+    )
+
+
+class RegionModelCache:
+    """
+    Size-bounded LRU of per-region model artifacts, lazy-loaded from disk.
+
+    Each region has its own ModelStore under <directory>/<region key>.
+    Regions without a stored model are remembered as misses in the same LRU,
+    so sparse regions fall back to the global model without touching disk.
+    """
+
+    def __init__(self, directory: str = None, max_size: int = None, cell_deg: float = None):
+        self.directory = Path(directory or os.getenv(
+            'REGION_MODEL_DIR', os.path.join(os.getenv('MODEL_DIR', './model_artifacts'), 'regions')
+        ))
+        self.max_size = int(max_size or os.getenv('REGION_CACHE_SIZE', '32'))
+        self.cell_deg = float(cell_deg or os.getenv('REGION_CELL_DEG', '1.0'))
+        self.keep_versions = int(os.getenv('REGION_KEEP_VERSIONS', '1'))
+        self._entries: "OrderedDict[str, Optional[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by clear() so callers can key derived caches on it
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def key_for(self, latitude: float, longitude: float) -> Optional[str]:
+        return region_key(latitude, longitude, self.cell_deg)
+
+    def store_for(self, key: str) -> ModelStore:
+        return ModelStore(directory=str(self.directory / key), keep_versions=self.keep_versions)
+
+    def regions(self) -> List[str]:
+        """Region keys that have a stored model"""
+        if not self.directory.exists():
+            return []
+        return sorted(
+            path.name for path in self.directory.iterdir()
+            if path.is_dir() and REGION_KEY_PATTERN.match(path.name)
+        )
+
+    def get(self, key: Optional[str]) -> Optional[Dict]:
+        """Return the region's artifact, or None when the region has no model"""
+        if key is None:
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        self.misses += 1
+        artifact = self.store_for(key).load()
+
+        with self._lock:
+            self._entries[key] = artifact
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return artifact
+
+    def save(self, key: str, model, scaler, metrics: Dict, features: List[str] = None) -> int:
+        """Persist a region model and drop any cached copy"""
+        version = self.store_for(key).save(
+            model, scaler, watermark={}, metrics=metrics, extra={"features": features}
+        )
+        self.invalidate(key)
+        return version
+
+    def remove_except(self, keep: List[str]):
+        """Delete stored region models that are no longer trained"""
+        keep = set(keep)
+        for key in self.regions():
+            if key not in keep:
+                shutil.rmtree(self.directory / key, ignore_errors=True)
+        self.clear()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "cached": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,217 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+from typing import Dict, List
+from dotenv import load_dotenv
+
+from ..models.database import ShadowEvaluation
+from ..utils.database import SessionLocal
+
+load_dotenv()
+
+
+class ShadowEvaluator:
+    """
+    Scores live traffic with a candidate model off the request path.
+
+    The request path only hands the weather rows and the active model that
+    scored them to a queue bounded to SHADOW_QUEUE_ROWS rows; when a batch
+    does not fit it is dropped and counted, never waited on. A worker thread
+    drains the queue, scores the raw rows with both the active and the
+    candidate model in batches of up to SHADOW_BATCH_SIZE, and writes one
+    summary row per batch to shadow_evaluations. Served scores are not
+    reused, since the prediction cache may have scored snapped features.
+    """
+
+    def __init__(self, prediction_service, level_edges: List[float], max_queue_rows: int = None,
+                 batch_size: int = None, flush_seconds: float = None, session_factory=None):
+        self.prediction_service = prediction_service
+        # Risk scores on the same side of every edge share a risk level
+        self.level_edges = np.asarray(level_edges, dtype=np.float64)
+        self.max_queue_rows = int(max_queue_rows or os.getenv('SHADOW_QUEUE_ROWS', '50000'))
+        self.batch_size = int(batch_size or os.getenv('SHADOW_BATCH_SIZE', '500'))
+        self.flush_seconds = float(flush_seconds or os.getenv('SHADOW_FLUSH_SECONDS', '5'))
+        self.session_factory = session_factory or SessionLocal
+
+        self.candidate = None
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        # Guards the open flag and the queued row count against submit
+        self._lock = threading.Lock()
+        self._open = False
+        self._queued_rows = 0
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+        self.agreements = 0
+        self.sum_delta = 0.0
+        self.sum_abs_delta = 0.0
+        self.max_abs_delta = 0.0
+        self.errors = 0
+
+    @property
+    def active(self) -> bool:
+        return self.candidate is not None
+
+    def start(self, artifact: Dict):
+        """Begin shadowing with a loaded model artifact, replacing any current candidate"""
+        self.stop()
+        self._reset_stats()
+        self.candidate = {
+            "version": artifact["version"],
+            "model": artifact["model"],
+            "scaler": artifact["scaler"],
+            "features": list(artifact.get("features") or [])
+        }
+        self._queue = queue.Queue()
+        self._queued_rows = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="shadow-evaluator", daemon=True)
+        self._thread.start()
+        with self._lock:
+            self._open = True
+
+    def stop(self):
+        """Stop shadowing; rows already queued are scored and flushed first"""
+        with self._lock:
+            self._open = False
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        self._thread = None
+        self.candidate = None
+
+    def submit(self, weather_list: List[dict], active: tuple, active_version) -> bool:
+        """
+        Queue rows scored by the active (model, scaler, features) for the
+        candidate without blocking; False if dropped
+        """
+        with self._lock:
+            if not self._open:
+                return False
+            if self._queued_rows + len(weather_list) > self.max_queue_rows:
+                self.dropped += len(weather_list)
+                return False
+            self._queued_rows += len(weather_list)
+            self.submitted += len(weather_list)
+            self._queue.put_nowait((weather_list, active, active_version))
+        return True
+
+    def _take(self, item) -> int:
+        """Release a dequeued batch's rows from the queue bound; returns its size"""
+        with self._lock:
+            self._queued_rows -= len(item[0])
+        return len(item[0])
+
+    def _run(self):
+        pending = []
+        pending_rows = 0
+        deadline = time.monotonic() + self.flush_seconds
+        while not self._stop.is_set():
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=min(timeout, 0.5))
+                pending.append(item)
+                pending_rows += self._take(item)
+            except queue.Empty:
+                pass
+
+            if pending and (pending_rows >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending, pending_rows = [], 0
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_seconds
+
+        # Submissions are closed by now, so the queue only shrinks
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(item)
+            pending_rows += self._take(item)
+            if pending_rows >= self.batch_size:
+                self._flush(pending)
+                pending, pending_rows = [], 0
+        if pending:
+            self._flush(pending)
+
+    def _flush(self, items: list):
+        # Group by active version so each summary row compares one model pair
+        by_version = {}
+        for weather_list, active, version in items:
+            rows, _ = by_version.setdefault(version, ([], active))
+            rows.extend(weather_list)
+
+        for active_version, (rows, active) in by_version.items():
+            try:
+                self._evaluate(rows, active, active_version)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error evaluating shadow model: {str(e)}")
+
+    def _scores(self, rows: List[dict], model, scaler, features: List[str]) -> np.ndarray:
+        """Outage probability of raw weather rows under one model"""
+        service = self.prediction_service
+        proba, classes = service.predict_proba(
+            service.prepare_features_batch(rows, features), model, scaler
+        )
+        return proba[:, list(classes).index(1)] if 1 in classes else np.zeros(len(rows))
+
+    def _evaluate(self, rows: List[dict], active_model: tuple, active_version):
+        candidate = self.candidate
+        if candidate is None:
+            return
+        active = self._scores(rows, *active_model)
+        shadow = self._scores(rows, candidate["model"], candidate["scaler"], candidate["features"])
+
+        delta = shadow - active
+        abs_delta = np.abs(delta)
+        agreements = int(np.count_nonzero(
+            np.searchsorted(self.level_edges, shadow, side='right')
+            == np.searchsorted(self.level_edges, active, side='right')
+        ))
+        summary = ShadowEvaluation(
+            active_version=active_version,
+            shadow_version=candidate["version"],
+            n_rows=len(rows),
+            agreements=agreements,
+            mean_delta=float(delta.mean()),
+            mean_abs_delta=float(abs_delta.mean()),
+            max_abs_delta=float(abs_delta.max())
+        )
+
+        db = self.session_factory()
+        try:
+            db.add(summary)
+            db.commit()
+        finally:
+            db.close()
+
+        self.scored += len(rows)
+        self.agreements += agreements
+        self.sum_delta += float(delta.sum())
+        self.sum_abs_delta += float(abs_delta.sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(abs_delta.max()))
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "shadow_version": self.candidate["version"] if self.candidate else None,
+            "queued_rows": self._queued_rows,
+            "max_queued_rows": self.max_queue_rows,
+            "submitted_rows": self.submitted,
+            "dropped_rows": self.dropped,
+            "scored_rows": self.scored,
+            "agreement_rate": self.agreements / self.scored if self.scored else None,
+            "mean_delta": self.sum_delta / self.scored if self.scored else None,
+            "mean_abs_delta": self.sum_abs_delta / self.scored if self.scored else None,
+            "max_abs_delta": self.max_abs_delta if self.scored else None,
+            "errors": self.errors
+        }
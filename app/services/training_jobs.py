@@ -0,0 +1,145 @@
+import asyncio
+import multiprocessing
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from .prediction_service import PredictionService
+from ..utils.database import SessionLocal, engine
+
+load_dotenv()
+
+
+def run_training_job(incremental: bool, base_version: Optional[int],
+                     labeling_mode: str, label_radius_km: float,
+                     regions: bool = False) -> Optional[int]:
+    """
+    Train in a worker process and return the stored model version, or the
+    number of region models trained when regions is set.
+
+    The worker starts from the parent's active artifact so incremental runs
+    extend the model that is actually being served. Returns None when there
+    is not enough data to train.
+    """
+    # Connections inherited from a forked parent must not be reused
+    engine.dispose(close=False)
+
+    # Training extends the full forest, whatever engine the parent serves with
+    service = PredictionService(
+        labeling_mode=labeling_mode, label_radius_km=label_radius_km,
+        inference_engine='sklearn'
+    )
+    if base_version is not None:
+        service.load_artifact(base_version)
+
+    db = SessionLocal()
+    try:
+        if regions:
+            return len(service.train_region_models(db)) or None
+        if not service.train_model(db, incremental=incremental):
+            return None
+        return service.model_version
+    finally:
+        db.close()
+
+
+class TrainingJobManager:
+    """Runs model training off the event loop and hot-swaps finished models"""
+
+    def __init__(self, prediction_service: PredictionService, max_jobs: int = None):
+        self.prediction_service = prediction_service
+        self.max_jobs = int(max_jobs or os.getenv('TRAINING_JOB_HISTORY', '100'))
+        self.jobs: Dict[str, dict] = OrderedDict()
+        self.current_job_id = None
+        self._executor = None
+        self._tasks = set()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork: the parent runs threads (shadow worker,
+            # SQLite cache workers) whose locks a forked child could inherit held
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self.jobs.get(job_id)
+
+    def is_running(self) -> bool:
+        job = self.jobs.get(self.current_job_id)
+        return job is not None and job["status"] == "running"
+
+    def submit(self, incremental: bool = False, regions: bool = False) -> dict:
+        """Start a training job, or return the one already running"""
+        if self.is_running():
+            return self.jobs[self.current_job_id]
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "running",
+            "incremental": incremental,
+            "regions": regions,
+            "created_at": datetime.utcnow().isoformat(),
+            "finished_at": None,
+            "model_version": None,
+            "success": None,
+            "error": None
+        }
+        self.jobs[job["job_id"]] = job
+        while len(self.jobs) > self.max_jobs:
+            self.jobs.popitem(last=False)
+        self.current_job_id = job["job_id"]
+
+        service = self.prediction_service
+        future = asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            run_training_job,
+            incremental,
+            service.model_version,
+            service.labeling_mode,
+            service.label_radius_km,
+            regions
+        )
+        task = asyncio.ensure_future(self._finish(job, future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _finish(self, job: dict, future: asyncio.Future):
+        """Wait for a job and swap its model in on the event loop thread"""
+        service = self.prediction_service
+        try:
+            result = await future
+            if job["regions"]:
+                # Region models are lazy-loaded, so drop cached copies and misses
+                service.region_models.clear()
+                service.prediction_cache.clear()
+                job["regions_trained"] = result or 0
+            else:
+                if result is not None and result != service.model_version:
+                    # Read the artifact off the loop, then swap in one step on it;
+                    # predictions running until now keep the previous model
+                    artifact = await asyncio.get_running_loop().run_in_executor(
+                        None, service.model_store.load, result
+                    )
+                    service.apply_artifact(artifact)
+                job["model_version"] = result
+            job["status"] = "completed"
+            job["success"] = result is not None
+        except Exception as e:
+            print(f"Training job {job['job_id']} failed: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = datetime.utcnow().isoformat()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
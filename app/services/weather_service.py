@@ -1,47 +1,354 @@
+import asyncio
+import math
 import os
-import requests
+import time
+import httpx
 from datetime import datetime
 from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .region_models import cell_center, region_key
+from ..utils.cache import TTLCache
+from ..utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from ..utils.disk_cache import DiskCache
+from ..utils.rate_limit import TokenBucket
 
 load_dotenv()
 
 class WeatherService:
     def __init__(self):
         self.api_key = os.getenv('OPENWEATHER_API_KEY')
-        self.base_url = "http://api.openweathermap.org/data/2.5"
+        self.base_url = os.getenv('OPENWEATHER_BASE_URL', "http://api.openweathermap.org/data/2.5")
         
         if not self.api_key:
             raise ValueError("OpenWeather API key not found in environment variables")
 
-    async def get_current_weather(self, lat: float, lon: float) -> Optional[Dict]:
+        # One pooled keep-alive client shared by every request, created on
+        # first use so it belongs to the running event loop
+        self.timeout = httpx.Timeout(
+            float(os.getenv('WEATHER_READ_TIMEOUT', '10')),
+            connect=float(os.getenv('WEATHER_CONNECT_TIMEOUT', '3'))
+        )
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv('WEATHER_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.getenv('WEATHER_MAX_KEEPALIVE', '20'))
+        )
+        # Upstream requests in flight at once; callers beyond this wait
+        self.concurrency = asyncio.Semaphore(int(os.getenv('WEATHER_MAX_CONCURRENCY', '50')))
+        # Upstream call quota of the provider plan; 0 disables the limit
+        rate_per_minute = float(os.getenv('WEATHER_RATE_PER_MINUTE', '60'))
+        self.rate_limit = TokenBucket(
+            rate_per_minute / 60,
+            capacity=float(os.getenv('WEATHER_RATE_BURST', str(max(rate_per_minute / 6, 1))))
+        )
+        # Cells fetched at once by get_current_weather_bulk
+        self.bulk_concurrency = int(os.getenv('WEATHER_BULK_CONCURRENCY', '20'))
+        self._client = None
+        # Stop calling the provider for a while after repeated failures
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv('WEATHER_BREAKER_FAILURES', '5')),
+            reset_seconds=float(os.getenv('WEATHER_BREAKER_RESET_SECONDS', '30'))
+        )
+
+        # Current conditions per grid cell, fetched at the cell centre; the
+        # provider refreshes them about every 10 minutes
+        self.cell_deg = float(os.getenv('WEATHER_CACHE_CELL_DEG', '0.05'))
+        self.cache = TTLCache(
+            max_size=int(os.getenv('WEATHER_CACHE_SIZE', '10000')),
+            ttl=float(os.getenv('WEATHER_CACHE_TTL', '600'))
+        )
+        # Last good observation per cell, served marked stale while the cell
+        # refreshes or the provider circuit is open
+        self.stale_seconds = float(os.getenv('WEATHER_STALE_SECONDS', '21600'))
+        self.last_known = TTLCache(max_size=self.cache.max_size, ttl=self.stale_seconds)
+        self.stale_served = 0
+        # Second tier shared by every worker on the host and kept across
+        # restarts; WEATHER_DISK_CACHE="" disables it
+        disk_path = os.getenv('WEATHER_DISK_CACHE', './weather_cache.db')
+        self.disk_cache = DiskCache(
+            disk_path,
+            ttl=self.cache.ttl,
+            lease_seconds=float(os.getenv('WEATHER_DISK_LEASE_SECONDS', '15')),
+            compact_seconds=float(os.getenv('WEATHER_DISK_COMPACT_SECONDS', '300')),
+            retain_seconds=self.stale_seconds
+        ) if disk_path else None
+        self.disk_poll_seconds = float(os.getenv('WEATHER_DISK_POLL_SECONDS', '0.05'))
+        # Upstream fetches in progress, shared by every caller for the same key
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def aclose(self):
+        """Close pooled connections; call on application shutdown"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def single_flight(self, key: tuple, fetch):
         """
-        Fetch current weather data for given coordinates
+        Await fetch() once per key: callers arriving while it runs share its
+        result instead of starting their own. The shared task is shielded so
+        a cancelled caller does not cancel it for the others.
         """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def cache_stats(self) -> Dict:
+        return {
+            **self.cache.stats(),
+            "disk": self.disk_cache.stats() if self.disk_cache else None,
+            "cell_deg": self.cell_deg,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "stale_served": self.stale_served,
+            "rate_limit": self.rate_limit.stats(),
+            "circuit": self.breaker.stats()
+        }
+
+    async def fetch(self, path: str, lat: float, lon: float, **params) -> Dict:
+        """
+        GET an API path for coordinates and return the decoded JSON body.
+        Raises CircuitOpenError without calling out while the circuit is open.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Weather provider circuit is open")
+        self.upstream_calls += 1
+        await self.rate_limit.acquire()
         try:
-            response = requests.get(
-                f"{self.base_url}/weather",
-                params={
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": self.api_key,
-                    "units": "metric"
-                }
-            )
+            async with self.concurrency:
+                response = await self.client.get(
+                    f"{self.base_url}/{path}",
+                    params={
+                        "lat": lat,
+                        "lon": lon,
+                        "appid": self.api_key,
+                        "units": "metric",
+                        **params
+                    }
+                )
             response.raise_for_status()
-            data = response.json()
-            
-            # Extract relevant weather data
-            return {
-                "timestamp": datetime.now().isoformat(),
-                "temperature": data["main"]["temp"],
-                "humidity": data["main"]["humidity"],
-                "wind_speed": data["wind"]["speed"],
-                "weather_condition": data["weather"][0]["main"],
-                "weather_description": data["weather"][0]["description"],
-                "rain_last_hour": data.get("rain", {}).get("1h", 0),
-                "clouds": data["clouds"]["all"]
-            }
+        except httpx.HTTPStatusError as e:
+            # Other client errors mean the provider is up but refused this request
+            if e.response.status_code >= 500 or e.response.status_code == 429:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except httpx.HTTPError:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response.json()
+
+    async def get_current_weather(self, lat: float, lon: float) -> Optional[Dict]:
+        """
+        Current weather for given coordinates, shared by every location in
+        the same grid cell for up to WEATHER_CACHE_TTL seconds. Concurrent
+        misses for a cell wait on a single upstream request. Once a cell has
+        expired, its last observation is returned with "stale": true and its
+        "age_seconds" while the cell refreshes in the background.
+        """
+        try:
+            return await self.current_weather(lat, lon)
         except Exception as e:
             print(f"Error fetching weather data: {str(e)}")
-            return None
\ No newline at end of file
+            return None
+
+    async def current_weather(self, lat: float, lon: float) -> Dict:
+        """Like get_current_weather, but raises when the weather cannot be fetched"""
+        key = region_key(lat, lon, self.cell_deg)
+        if key is None:
+            return self.observation(await self.fetch_current_weather(lat, lon), stale=False)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return self.observation(cached, stale=False)
+
+        last = self.last_known.get(key)
+        if last is None and self.disk_cache is not None:
+            # Another worker may have stored the cell, or a previous process
+            hit = await asyncio.to_thread(self.disk_cache.get_stale, self.disk_key(key))
+            if hit is not None:
+                last, stored_at = hit
+                # Both local expiries count from when the row was stored
+                age = time.time() - stored_at
+                if age >= self.stale_seconds:
+                    last = None
+                elif age < self.cache.ttl:
+                    self.remember(key, last, ttl=self.cache.ttl - age,
+                                  stale_ttl=self.stale_seconds - age)
+                    return self.observation(last, stale=False)
+                else:
+                    self.last_known.set(key, last, ttl=self.stale_seconds - age)
+        if last is None:
+            data = await self.single_flight(("weather", key), lambda: self.load_cell(key, lat, lon))
+            return self.observation(data, stale=False)
+
+        self.refresh(key, lat, lon)
+        self.stale_served += 1
+        return self.observation(last, stale=True)
+
+    @staticmethod
+    def observation(data: Dict, stale: bool) -> Dict:
+        """A copy of cached weather data marked with its freshness and age"""
+        age = (datetime.now() - datetime.fromisoformat(data["timestamp"])).total_seconds()
+        return {**data, "stale": stale, "age_seconds": round(max(age, 0.0), 1)}
+
+    def refresh(self, key: str, lat: float, lon: float):
+        """Reload a cell in the background unless it is loading or the circuit is open"""
+        if ("weather", key) in self._inflight or self.breaker.state == "open":
+            return
+        task = asyncio.ensure_future(
+            self.single_flight(("weather", key), lambda: self.load_cell(key, lat, lon))
+        )
+        task.add_done_callback(self._log_refresh)
+
+    @staticmethod
+    def _log_refresh(task: asyncio.Future):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and not isinstance(error, CircuitOpenError):
+            print(f"Error refreshing weather data: {str(error)}")
+
+    def remember(self, key: str, data: Dict, ttl: float = None, stale_ttl: float = None):
+        """Cache a cell's weather and keep it as the cell's last known observation"""
+        self.cache.set(key, data, ttl=ttl)
+        self.last_known.set(key, data, ttl=stale_ttl)
+
+    def disk_key(self, key: str) -> str:
+        return f"weather:{self.cell_deg}:{key}"
+
+    async def get_current_weather_bulk(self, coordinates: List[Tuple[float, float]],
+                                       max_concurrency: int = None) -> AsyncIterator[Dict]:
+        """
+        Current weather for many coordinates, yielded as each grid cell
+        completes. Coordinates are grouped by cell so each cell is looked up
+        once, with at most max_concurrency cells in flight; upstream calls
+        also pass the provider rate limit. Each result carries the index of
+        its coordinate and either the weather or the error for that cell.
+        """
+        cells: Dict[str, List[int]] = {}
+        for index, (lat, lon) in enumerate(coordinates):
+            cells.setdefault(region_key(lat, lon, self.cell_deg), []).append(index)
+
+        for index in cells.pop(None, []):
+            lat, lon = coordinates[index]
+            yield {"index": index, "latitude": lat, "longitude": lon, "cell": None,
+                   "weather": None, "error": "Invalid coordinates"}
+
+        slots = asyncio.Semaphore(max_concurrency or self.bulk_concurrency)
+
+        async def load(key: str, indices: List[int]):
+            async with slots:
+                try:
+                    return key, indices, await self.current_weather(*coordinates[indices[0]]), None
+                except Exception as e:
+                    return key, indices, None, str(e) or type(e).__name__
+
+        tasks = [asyncio.ensure_future(load(key, indices)) for key, indices in cells.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                key, indices, data, error = await next_done
+                for index in indices:
+                    lat, lon = coordinates[index]
+                    yield {"index": index, "latitude": lat, "longitude": lon, "cell": key,
+                           "weather": dict(data) if data else None, "error": error}
+        finally:
+            # The consumer stopped early; do not keep fetching for it
+            for task in tasks:
+                task.cancel()
+
+    async def load_cell(self, key: str, lat: float, lon: float) -> Optional[Dict]:
+        """
+        Current weather for a cell missing from memory: from the disk cache
+        when another process stored it recently, otherwise fetched upstream
+        by whichever process takes the cell's fill lease while the others
+        poll the disk for its result. Stores what it finds in memory.
+        """
+        center = cell_center(lat, lon, self.cell_deg)
+        if self.disk_cache is None:
+            data = await self.fetch_current_weather(*center)
+            self.remember(key, data)
+            return data
+
+        disk_key = self.disk_key(key)
+        deadline = time.monotonic() + self.disk_cache.lease_seconds
+        while True:
+            hit = await asyncio.to_thread(self.disk_cache.get, disk_key)
+            if hit is not None:
+                data, stored_at = hit
+                age = time.time() - stored_at
+                self.remember(key, data, ttl=self.cache.ttl - age,
+                              stale_ttl=self.stale_seconds - age)
+                return data
+            # Past the deadline the lease holder is presumed dead and we fetch
+            if time.monotonic() >= deadline or await asyncio.to_thread(self.disk_cache.acquire, disk_key):
+                break
+            await asyncio.sleep(self.disk_poll_seconds)
+
+        try:
+            data = await self.fetch_current_weather(*center)
+        except BaseException:
+            await asyncio.to_thread(self.disk_cache.release, disk_key)
+            raise
+        self.remember(key, data)
+        await asyncio.to_thread(self.disk_cache.set, disk_key, data)
+        return data
+
+    async def fetch_current_weather(self, lat: float, lon: float) -> Optional[Dict]:
+        """
+        Fetch current weather data for given coordinates from the provider
+        """
+        data = await self.fetch("weather", lat, lon)
+
+        # Extract relevant weather data
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "temperature": data["main"]["temp"],
+            "humidity": data["main"]["humidity"],
+            "wind_speed": data["wind"]["speed"],
+            "weather_condition": data["weather"][0]["main"],
+            "weather_description": data["weather"][0]["description"],
+            "rain_last_hour": data.get("rain", {}).get("1h", 0),
+            "clouds": data["clouds"]["all"]
+        }
+
+    async def get_forecast(self, lat: float, lon: float, hours: int = 48) -> Optional[List[Dict]]:
+        """
+        Fetch the 3-hourly forecast for the next hours at given coordinates,
+        one dict per step with the same fields as get_current_weather
+        """
+        try:
+            data = await self.fetch("forecast", lat, lon, cnt=math.ceil(hours / 3))
+
+            # Rain is forecast as a 3 hour total; keep it as an hourly rate
+            return [
+                {
+                    "timestamp": datetime.utcfromtimestamp(step["dt"]).isoformat(),
+                    "temperature": step["main"]["temp"],
+                    "humidity": step["main"]["humidity"],
+                    "wind_speed": step["wind"]["speed"],
+                    "weather_condition": step["weather"][0]["main"],
+                    "weather_description": step["weather"][0]["description"],
+                    "rain_last_hour": step.get("rain", {}).get("3h", 0) / 3,
+                    "clouds": step["clouds"]["all"]
+                }
+                for step in data["list"]
+            ]
+        except Exception as e:
+            print(f"Error fetching weather forecast: {str(e)}")
+            return None
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency while its circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Fails calls to a dependency fast after repeated errors.
+
+    After failure_threshold consecutive failures the circuit opens and
+    allow() refuses calls for reset_seconds. Then a single trial call is let
+    through (half open): success closes the circuit, failure opens it again.
+    A trial that never reports back is followed by another reset_seconds
+    later.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._trial or time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; counts the refusal if not"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_seconds:
+                # Re-arm the timer so calls during the trial are refused
+                self._opened_at = now
+                self._trial = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._trial = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            state = self.state
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": (
+                    max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+                    if self._opened_at is not None else 0.0
+                ),
+                "opened": self.opened,
+                "rejected": self.rejected
+            }
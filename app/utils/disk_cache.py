@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+
+class DiskCache:
+    """
+    TTL cache in a local SQLite file, shared by every process on the host.
+
+    Values are stored as JSON with wall-clock expiry times, so a restarted
+    process reads what its predecessor stored. The file runs in WAL mode, so
+    readers never wait on the writer. Fill leases let one process refresh a
+    key while the others wait for its result instead of repeating the work.
+    Expired rows stay readable through get_stale for retain_seconds, then are
+    deleted and their pages returned to the file system, at most every
+    compact_seconds.
+    """
+
+    def __init__(self, path: str, ttl: float, lease_seconds: float = 10.0,
+                 compact_seconds: float = 300.0, retain_seconds: float = 0.0):
+        self.path = path
+        self.ttl = ttl
+        self.retain_seconds = retain_seconds
+        self.lease_seconds = lease_seconds
+        self.compact_seconds = compact_seconds
+        # Identifies this process's leases
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_compact = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compactions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        db = self._connection()
+        # auto_vacuum only takes effect on a new file, before any table exists
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+        self.compact()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must stay on the thread that opened them
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, stored_at) for an unexpired key, else None"""
+        row = self._connection().execute(
+            "SELECT value, stored_at FROM entries WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, stored_at) for a key even if expired, while it is retained"""
+        row = self._connection().execute(
+            "SELECT value, stored_at FROM entries WHERE key = ? AND expires_at > ?",
+            (key, time.time() - self.retain_seconds)
+        ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def set(self, key: str, value: Any, ttl: float = None):
+        """Store a value and release this process's lease on the key"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, expires_at)
+            )
+            db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+        with self._lock:
+            self.writes += 1
+            compact = now >= self._next_compact
+        if compact:
+            self.compact()
+
+    def acquire(self, key: str) -> bool:
+        """Take the fill lease for a key; False while another process holds it"""
+        now = time.time()
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            db.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self.owner, now + self.lease_seconds)
+            )
+            row = db.execute("SELECT owner FROM leases WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] == self.owner
+
+    def release(self, key: str):
+        db = self._connection()
+        with db:
+            db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def compact(self):
+        """Delete entries past retention and expired leases and shrink the file"""
+        now = time.time()
+        with self._lock:
+            self._next_compact = now + self.compact_seconds
+        db = self._connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM entries WHERE expires_at <= ?", (now - self.retain_seconds,))
+            db.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+        # executescript steps the pragma to completion; execute frees one page
+        db.executescript("PRAGMA incremental_vacuum;")
+        # Move the freed pages out of the WAL so the file itself shrinks
+        db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        with self._lock:
+            self.compactions += 1
+
+    def stats(self) -> Dict:
+        size = self._connection().execute(
+            "SELECT COUNT(*) FROM entries WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "size": size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "compactions": self.compactions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
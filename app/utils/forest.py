@@ -0,0 +1,229 @@
+import json
+import numpy as np
+from pathlib import Path
+
+
+def average_tree_proba(per_tree: np.ndarray) -> np.ndarray:
+    """
+    Average per-tree probabilities of shape (n_trees, n_rows, n_classes).
+
+    Trees are summed one at a time in estimator order, as
+    RandomForestClassifier.predict_proba does, so the result is bit-identical.
+    """
+    proba = np.zeros(per_tree.shape[1:], dtype=np.float64)
+    for tree_proba in per_tree:
+        proba += tree_proba
+    proba /= len(per_tree)
+    return proba
+
+
+def _node_depths(children_left: np.ndarray, children_right: np.ndarray) -> np.ndarray:
+    """Depth of every node; sklearn stores parents before their children"""
+    depth = np.zeros(len(children_left), dtype=np.int64)
+    for node in range(len(children_left)):
+        if children_left[node] != -1:
+            depth[children_left[node]] = depth[node] + 1
+            depth[children_right[node]] = depth[node] + 1
+    return depth
+
+
+def _truncation_depth(depth: np.ndarray, is_leaf: np.ndarray, max_depth, max_leaf_nodes) -> int:
+    """Deepest cut, at most max_depth, that leaves a tree with at most max_leaf_nodes leaves"""
+    cut = int(depth.max()) if max_depth is None else min(int(depth.max()), max_depth)
+    if max_leaf_nodes is None:
+        return cut
+    while cut > 0 and np.count_nonzero((depth == cut) | (is_leaf & (depth < cut))) > max_leaf_nodes:
+        cut -= 1
+    return cut
+
+
+class CompiledForest:
+    """
+    A fitted random forest flattened into NumPy arrays.
+
+    Every tree's nodes are concatenated into shared feature / threshold /
+    child / leaf-value arrays, and all trees are walked for all rows at once,
+    one tree level per step. Leaves point at themselves, and (row, tree) pairs
+    that reach a leaf are dropped from the working set. Results match
+    RandomForestClassifier.predict_proba exactly: inputs are compared as
+    float32 like sklearn's trees do, leaf values are normalized the same way
+    and per-tree probabilities are summed in estimator order before averaging.
+
+    A compact forest (from_sklearn(..., compact=True)) trades that exactness
+    for size: trees are cut at a bounded depth and leaf count, thresholds and
+    leaf values are float32 and indices use the narrowest integer types. It
+    can be saved as plain .npy files and memory-mapped read-only, so several
+    worker processes share one copy.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots', 'is_leaf')
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, depth, classes,
+                 is_leaf=None):
+        self.is_leaf = is_leaf if is_leaf is not None else left == np.arange(len(left))
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes_ = classes
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    @classmethod
+    def from_sklearn(cls, model, max_depth: int = None, max_leaf_nodes: int = None,
+                     compact: bool = False) -> "CompiledForest":
+        """
+        Export a fitted RandomForestClassifier into flat arrays, optionally
+        cutting each tree at max_depth / max_leaf_nodes. A cut node becomes a
+        leaf predicting the class distribution of the samples that reached it.
+        """
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        depth = 0
+        offset = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            children_left = tree.children_left
+            children_right = tree.children_right
+            tree_feature = tree.feature
+            tree_threshold = tree.threshold
+            node_value = tree.value[:, 0, :estimator.n_classes_]
+            if hasattr(tree, 'missing_go_to_left'):
+                missing_left = np.asarray(tree.missing_go_to_left, dtype=bool)
+            else:
+                missing_left = np.zeros(tree.node_count, dtype=bool)
+            tree_depth = tree.max_depth
+
+            if max_depth is not None or max_leaf_nodes is not None:
+                node_depth = _node_depths(children_left, children_right)
+                cut = _truncation_depth(node_depth, children_left == -1, max_depth, max_leaf_nodes)
+                keep = node_depth <= cut
+                new_id = np.cumsum(keep) - 1
+                cut_here = keep & (node_depth == cut)
+                children_left = np.where(cut_here, -1, np.where(
+                    children_left >= 0, new_id[np.maximum(children_left, 0)], -1))[keep]
+                children_right = np.where(cut_here, -1, np.where(
+                    children_right >= 0, new_id[np.maximum(children_right, 0)], -1))[keep]
+                tree_feature = tree_feature[keep]
+                tree_threshold = tree_threshold[keep]
+                node_value = node_value[keep]
+                missing_left = missing_left[keep]
+                tree_depth = min(tree_depth, cut)
+
+            n_nodes = len(children_left)
+            node_ids = np.arange(n_nodes)
+            is_leaf = children_left == -1
+
+            # Leaves loop back to themselves; inner nodes point at global ids
+            left = np.where(is_leaf, node_ids, children_left) + offset
+            right = np.where(is_leaf, node_ids, children_right) + offset
+
+            # Normalize leaf values exactly like DecisionTreeClassifier.predict_proba
+            proba = node_value.astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            proba = proba / normalizer
+
+            features.append(np.where(is_leaf, 0, tree_feature))
+            thresholds.append(tree_threshold)
+            lefts.append(left)
+            rights.append(right)
+            missing.append(missing_left)
+            values.append(proba)
+            roots.append(offset)
+            depth = max(depth, tree_depth)
+            offset += n_nodes
+
+        threshold = np.concatenate(thresholds)
+        if compact:
+            index_type = np.int32 if offset < 2 ** 31 else np.int64
+            feature_type = np.uint8 if model.n_features_in_ <= 256 else np.int32
+            float_type = np.float32
+            # Inputs are float32, so x <= t holds exactly when x is at most
+            # the largest float32 not above t; round thresholds down to it
+            rounded = threshold.astype(np.float32)
+            threshold = np.where(
+                rounded > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded
+            )
+        else:
+            index_type = feature_type = np.intp
+            float_type = np.float64
+
+        return cls(
+            feature=np.concatenate(features).astype(feature_type),
+            threshold=threshold.astype(float_type),
+            left=np.concatenate(lefts).astype(index_type),
+            right=np.concatenate(rights).astype(index_type),
+            missing_left=np.concatenate(missing),
+            value=np.concatenate(values).astype(float_type),
+            roots=np.asarray(roots, dtype=index_type),
+            depth=int(depth),
+            classes=np.asarray(model.classes_)
+        )
+
+    def save(self, directory):
+        """Write the arrays as .npy files so load() can memory-map them"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        with open(directory / "meta.json", "w") as meta:
+            json.dump({"depth": self.depth, "classes": self.classes_.tolist()}, meta)
+
+    @classmethod
+    def load(cls, directory, mmap_mode: str = 'r') -> "CompiledForest":
+        directory = Path(directory)
+        with open(directory / "meta.json") as meta:
+            meta = json.load(meta)
+        arrays = {
+            name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode)
+            for name in cls.ARRAYS
+        }
+        return cls(depth=meta["depth"], classes=np.asarray(meta["classes"]), **arrays)
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf id reached by every row in every tree, shape (n_trees, n_rows)"""
+        X = np.asarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        nodes = np.repeat(self.roots, n_rows)
+        rows = np.tile(np.arange(n_rows), self.n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+
+        for _ in range(self.depth):
+            if len(active) == 0:
+                break
+            current = nodes[active]
+            x = X[rows[active], self.feature[current]]
+            go_left = np.where(np.isnan(x), self.missing_left[current], x <= self.threshold[current])
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+
+        return nodes.reshape(self.n_trees, n_rows)
+
+    def tree_proba(self, X: np.ndarray) -> np.ndarray:
+        """Per-tree class probabilities, shape (n_trees, n_rows, n_classes)"""
+        return self.value[self.apply(X)]
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Average of per-tree class probabilities, summed in estimator order"""
+        return average_tree_proba(self.tree_proba(X))
+
+
+def sklearn_forest_nbytes(model) -> int:
+    """Bytes held by the node and value arrays of a fitted sklearn forest"""
+    total = 0
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    return total
@@ -0,0 +1,130 @@
+import numpy as np
+from datetime import timedelta
+
+OUTAGE_WINDOW = timedelta(hours=6)
+
+
+def to_datetime64(timestamps) -> np.ndarray:
+    """Convert a sequence of datetimes into a datetime64[us] array"""
+    return np.array(timestamps, dtype='datetime64[us]')
+
+
+def label_outage_windows(weather_times, outage_times, window: timedelta = OUTAGE_WINDOW) -> np.ndarray:
+    """
+    Label each weather timestamp 1 if any outage started within +/- window of it.
+
+    Outage start times are sorted once and every weather timestamp is located
+    with a binary search, so labeling costs O((n + m) log m) instead of O(n * m).
+    """
+    weather_times = to_datetime64(weather_times)
+    outage_times = np.sort(to_datetime64(outage_times))
+
+    if len(outage_times) == 0 or len(weather_times) == 0:
+        return np.zeros(len(weather_times), dtype=np.int64)
+
+    delta = np.timedelta64(window)
+    # First outage starting no earlier than (t - window); a hit if it also starts
+    # no later than (t + window).
+    idx = np.searchsorted(outage_times, weather_times - delta, side='left')
+    in_range = idx < len(outage_times)
+    nearest = outage_times[np.minimum(idx, len(outage_times) - 1)]
+    hits = in_range & (nearest <= weather_times + delta)
+    return hits.astype(np.int64)
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_unit_vectors(latitudes, longitudes) -> np.ndarray:
+    """Project lat/lon degrees onto the unit sphere so Euclidean KD-tree queries work"""
+    lat = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon = np.radians(np.asarray(longitudes, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def chord_radius(radius_km: float) -> float:
+    """Convert a great-circle radius in km into a chord length on the unit sphere"""
+    return 2.0 * np.sin(min(radius_km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+
+def label_outage_windows_spatial(
+    weather_times, weather_lats, weather_lons,
+    outage_times, outage_school_ids,
+    school_ids, school_lats, school_lons,
+    radius_km: float, window: timedelta = OUTAGE_WINDOW
+) -> np.ndarray:
+    """
+    Label each weather record 1 if an outage started within +/- window of it
+    at a school no further than radius_km away.
+
+    Weather records are joined to schools with a KD-tree over unit-sphere
+    coordinates, giving flat (record, school) pair arrays. Outage start times
+    are sorted per school and offset into disjoint blocks, so every pair is
+    resolved with one batched searchsorted.
+    """
+    from scipy.spatial import cKDTree
+
+    weather_times = to_datetime64(weather_times)
+    labels = np.zeros(len(weather_times), dtype=np.int64)
+
+    outage_times = to_datetime64(outage_times)
+    outage_school_ids = np.asarray(outage_school_ids, dtype=np.float64)
+    school_ids = np.asarray(school_ids, dtype=np.int64)
+    school_lats = np.asarray(school_lats, dtype=np.float64)
+    school_lons = np.asarray(school_lons, dtype=np.float64)
+    weather_lats = np.asarray(weather_lats, dtype=np.float64)
+    weather_lons = np.asarray(weather_lons, dtype=np.float64)
+
+    # Only schools that have outages and known coordinates can produce positives
+    school_mask = (
+        np.isin(school_ids, outage_school_ids)
+        & ~np.isnan(school_lats) & ~np.isnan(school_lons)
+    )
+    school_ids = school_ids[school_mask]
+    weather_mask = (
+        ~np.isnat(weather_times) & ~np.isnan(weather_lats) & ~np.isnan(weather_lons)
+    )
+    if len(school_ids) == 0 or not weather_mask.any():
+        return labels
+
+    # Keep outages belonging to the remaining schools, addressed by school position
+    school_order = np.argsort(school_ids)
+    sorted_school_ids = school_ids[school_order]
+    outage_mask = np.isin(outage_school_ids, sorted_school_ids) & ~np.isnat(outage_times)
+    if not outage_mask.any():
+        return labels
+    outage_pos = np.searchsorted(sorted_school_ids, outage_school_ids[outage_mask])
+    outage_times = outage_times[outage_mask]
+
+    # Join weather records to schools within the radius
+    weather_idx = np.flatnonzero(weather_mask)
+    weather_tree = cKDTree(to_unit_vectors(weather_lats[weather_idx], weather_lons[weather_idx]))
+    school_tree = cKDTree(to_unit_vectors(
+        school_lats[school_mask][school_order], school_lons[school_mask][school_order]
+    ))
+    pairs = school_tree.sparse_distance_matrix(
+        weather_tree, chord_radius(radius_km), output_type='ndarray'
+    )
+    if len(pairs) == 0:
+        return labels
+    pair_school = pairs['i'].astype(np.int64)
+    pair_weather = weather_idx[pairs['j']]
+
+    # Give every school its own time block so one sorted key array serves all schools
+    delta = np.timedelta64(window).astype('timedelta64[us]').astype(np.int64)
+    weather_us = weather_times[pair_weather].astype(np.int64)
+    outage_us = outage_times.astype(np.int64)
+    origin = min(weather_us.min(), outage_us.min())
+    span = max(weather_us.max(), outage_us.max()) - origin + 2 * delta + 1
+
+    outage_keys = np.sort(outage_pos * span + (outage_us - origin))
+    pair_keys = pair_school * span + (weather_us - origin)
+
+    idx = np.searchsorted(outage_keys, pair_keys - delta, side='left')
+    in_range = idx < len(outage_keys)
+    nearest = outage_keys[np.minimum(idx, len(outage_keys) - 1)]
+    hits = in_range & (nearest <= pair_keys + delta)
+
+    labels[pair_weather[hits]] = 1
+    return labels
@@ -0,0 +1,49 @@
+import asyncio
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Async token bucket: rate tokens per second, up to capacity saved for
+    bursts. acquire() waits until a token is free; waiters are served in
+    arrival order. A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = max(1.0, capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # Holding the lock while sleeping keeps waiters in arrival order
+        async with self._lock:
+            start = time.monotonic()
+            self._refill(start)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill(time.monotonic())
+            self._tokens -= 1
+            self.acquired += 1
+            self.waited_seconds += time.monotonic() - start
+
+    def stats(self) -> Dict:
+        if self.rate > 0:
+            self._refill(time.monotonic())
+        return {
+            "rate_per_second": self.rate,
+            "capacity": self.capacity,
+            "available": self._tokens if self.rate > 0 else None,
+            "acquired": self.acquired,
+            "waited_seconds": self.waited_seconds
+        }
@@ -0,0 +1,163 @@
+import numpy as np
+from typing import Dict, Tuple
+
+SAMPLING_STRATEGIES = ('stratified', 'decay', 'cap')
+CLASS_WEIGHTINGS = ('balanced', 'history')
+
+
+def stratify_by_time(timestamps: np.ndarray, bucket: np.timedelta64 = np.timedelta64(1, 'D')) -> np.ndarray:
+    """Stratum id of every row: the time bucket (one day by default) it falls in"""
+    ticks = timestamps.astype('datetime64[us]').astype(np.int64)
+    return (ticks - ticks.min()) // (bucket // np.timedelta64(1, 'us'))
+
+
+def downsample_negatives(y: np.ndarray, strata: np.ndarray, ratio: float,
+                         rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep every positive and about ratio negatives per positive, drawn at the
+    same rate from every stratum so no period is thinned more than another.
+
+    Returns the kept row indices and their sample weights: each kept negative
+    stands in for the negatives dropped from its stratum, so weighted class
+    frequencies (and hence predicted probabilities) stay unbiased.
+    """
+    weights = np.ones(len(y))
+    positives = np.flatnonzero(y == 1)
+    negatives = np.flatnonzero(y != 1)
+    target = int(np.ceil(ratio * len(positives)))
+    if len(positives) == 0 or target >= len(negatives):
+        return np.arange(len(y)), weights
+
+    # Rank negatives randomly within their stratum and keep the same share
+    # of each one, rounding up so small strata keep at least one row
+    rate = target / len(negatives)
+    neg_strata = strata[negatives]
+    order = np.lexsort((rng.random(len(negatives)), neg_strata))
+    sorted_strata = neg_strata[order]
+    starts = np.flatnonzero(np.r_[True, sorted_strata[1:] != sorted_strata[:-1]])
+    counts = np.diff(np.r_[starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(starts, counts)
+    quota = np.ceil(counts * rate).astype(np.int64)
+    keep = rank < np.repeat(quota, counts)
+
+    kept = negatives[order[keep]]
+    weights[kept] = np.repeat(counts / quota, counts)[keep]
+    index = np.sort(np.concatenate([positives, kept]))
+    return index, weights[index]
+
+
+def _class_budget(y: np.ndarray, max_rows: int) -> Tuple[int, int]:
+    """Split max_rows so positives keep up to half of it and negatives fill the rest"""
+    n_pos = int(np.count_nonzero(y == 1))
+    n_neg = len(y) - n_pos
+    pos_budget = min(n_pos, max(max_rows - n_neg, max_rows // 2))
+    return pos_budget, min(n_neg, max_rows - pos_budget)
+
+
+def decayed_reservoir(timestamps: np.ndarray, y: np.ndarray, max_rows: int, half_life_days: float,
+                      rng: np.random.Generator) -> np.ndarray:
+    """
+    Weighted reservoir sample (Efraimidis-Spirakis) of at most max_rows rows,
+    where a row's weight halves every half_life_days of age relative to the
+    newest row. Positives and negatives get separate reservoirs so the rare
+    class is never crowded out. Returns sorted row indices.
+    """
+    if len(y) <= max_rows:
+        return np.arange(len(y))
+
+    ticks = timestamps.astype('datetime64[us]').astype(np.int64)
+    age_days = (ticks.max() - ticks) / 86_400e6
+    # log(u ** (1 / w)) with w = 0.5 ** (age / half_life); the largest keys win
+    log_keys = np.log(rng.random(len(y))) * np.exp2(age_days / half_life_days)
+
+    picked = []
+    for rows, budget in zip((np.flatnonzero(y == 1), np.flatnonzero(y != 1)), _class_budget(y, max_rows)):
+        if budget < len(rows):
+            rows = rows[np.argpartition(-log_keys[rows], budget - 1)[:budget]] if budget else rows[:0]
+        picked.append(rows)
+    return np.sort(np.concatenate(picked))
+
+
+def cap_rows(y: np.ndarray, max_rows: int, rng: np.random.Generator) -> np.ndarray:
+    """Uniformly sample at most max_rows rows, keeping up to half of them positive"""
+    if len(y) <= max_rows:
+        return np.arange(len(y))
+    picked = []
+    for rows, budget in zip((np.flatnonzero(y == 1), np.flatnonzero(y != 1)), _class_budget(y, max_rows)):
+        picked.append(rng.choice(rows, size=budget, replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def balance_classes(y: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Rescale weights so every class carries the same total weight, like
+    class_weight='balanced', keeping relative weights within a class.
+    """
+    weights = weights.copy()
+    labels = np.unique(y)
+    for label in labels:
+        mask = y == label
+        weights[mask] *= len(y) / (len(labels) * weights[mask].sum())
+    return weights
+
+
+def sample_training_rows(y: np.ndarray, timestamps: np.ndarray, strategies, max_rows: int = 0,
+                         negative_ratio: float = 10.0, half_life_days: float = 90.0,
+                         weighting: str = 'balanced',
+                         seed: int = None) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """
+    Choose the rows and sample weights for a fit.
+
+    strategies is any of "stratified" (negative downsampling with weights),
+    "decay" (time-decayed reservoir of max_rows) and "cap" (uniform sample of
+    max_rows), applied in that order; a positive max_rows is always enforced.
+    Row budgets favour positives. weighting "balanced" then gives each class
+    the same total weight; "history" rescales each class so the weighted
+    class mix matches the full history, which keeps probabilities calibrated
+    to the source rate.
+
+    Returns (row indices, sample weights, summary).
+    """
+    unknown = set(strategies) - set(SAMPLING_STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown sampling strategies: {', '.join(sorted(unknown))}")
+    if weighting not in CLASS_WEIGHTINGS:
+        raise ValueError(f"Unknown class weighting: {weighting}")
+
+    rng = np.random.default_rng(seed)
+    index = np.arange(len(y))
+    weights = np.ones(len(y))
+
+    if 'stratified' in strategies:
+        kept, weights = downsample_negatives(y, stratify_by_time(timestamps), negative_ratio, rng)
+        index = index[kept]
+
+    if max_rows and len(index) > max_rows:
+        if 'decay' in strategies:
+            kept = decayed_reservoir(timestamps[index], y[index], max_rows, half_life_days, rng)
+        else:
+            kept = cap_rows(y[index], max_rows, rng)
+        totals = [weights[(y[index] == 1) == bool(label)].sum() for label in (0, 1)]
+        index, weights = index[kept], weights[kept]
+        if weighting == 'history':
+            # Rescale each class so the weighted class mix still matches the
+            # rows the budget was drawn from
+            for label, total in zip((0, 1), totals):
+                mask = (y[index] == 1) == bool(label)
+                if mask.any():
+                    weights[mask] *= total / weights[mask].sum()
+
+    if weighting == 'balanced' and len(index):
+        weights = balance_classes(y[index], weights)
+
+    positive = y[index] == 1
+    summary = {
+        "strategies": [name for name in SAMPLING_STRATEGIES if name in strategies],
+        "weighting": weighting,
+        "source_rows": int(len(y)),
+        "sampled_rows": int(len(index)),
+        "source_positive_rate": float(np.mean(y == 1)) if len(y) else 0.0,
+        "sampled_positive_rate": float(np.mean(positive)) if len(index) else 0.0,
+        "weighted_positive_rate": float(weights[positive].sum() / weights.sum()) if len(index) else 0.0
+    }
+    return index, weights, summary
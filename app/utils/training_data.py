@@ -0,0 +1,164 @@
+import os
+import numpy as np
+from typing import Dict, List
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from ..models.database import WeatherRecord, WeatherFeatures, NetworkOutage
+
+load_dotenv()
+
+# Rows fetched per round trip; also the server-side cursor batch size
+CHUNK_SIZE = int(os.getenv('TRAINING_CHUNK_SIZE', '50000'))
+
+
+def _stream_into(db: Session, model, columns, criteria, arrays: Dict[str, np.ndarray],
+                 converters, chunk_size: int, joins=()) -> int:
+    """
+    Count matching rows, preallocate the output arrays and fill them from a
+    column-only SELECT streamed in chunks. Returns the number of rows filled.
+
+    Rows are bounded by the highest id present when loading starts, so
+    concurrent inserts cannot overflow the preallocated arrays. joins are
+    (target, onclause) pairs outer-joined one-to-one onto model.
+    """
+    def joined(stmt):
+        stmt = stmt.select_from(model)
+        for target, onclause in joins:
+            stmt = stmt.outerjoin(target, onclause)
+        return stmt
+
+    max_id = db.execute(joined(select(func.max(model.id))).where(*criteria)).scalar()
+    criteria = (*criteria, model.id <= (max_id or 0))
+    n_rows = 0
+    if max_id is not None:
+        n_rows = db.execute(joined(select(func.count())).where(*criteria)).scalar()
+
+    for name, (dtype, width) in converters.items():
+        shape = (n_rows, width) if width else (n_rows,)
+        arrays[name] = np.empty(shape, dtype=dtype)
+    if n_rows == 0:
+        return 0
+
+    stmt = joined(select(*columns)).where(*criteria).order_by(model.id)
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+
+    filled = 0
+    for partition in result.partitions(chunk_size):
+        end = min(filled + len(partition), n_rows)
+        rows = partition[:end - filled]
+        columns_data = list(zip(*rows))
+        position = 0
+        for name, (dtype, width) in converters.items():
+            if width:
+                block = columns_data[position:position + width]
+                arrays[name][filled:end] = np.array(block, dtype=dtype).T
+                position += width
+            else:
+                arrays[name][filled:end] = np.array(columns_data[position], dtype=dtype)
+                position += 1
+        filled = end
+        if filled == n_rows:
+            break
+    result.close()
+
+    for name in arrays:
+        arrays[name] = arrays[name][:filled]
+    return filled
+
+
+def load_weather_arrays(db: Session, features: List[str], *criteria,
+                        chunk_size: int = None) -> Dict[str, np.ndarray]:
+    """
+    Load weather records matching criteria as NumPy arrays, without ORM objects.
+
+    Returns a dict with "id", "timestamp" (datetime64[us]), "latitude",
+    "longitude" and "features" (one column per name in features). Names that
+    are not WeatherRecord columns are read from the materialized
+    weather_features row of each record, NaN where it has none.
+    """
+    feature_columns = [
+        getattr(WeatherRecord, name) if hasattr(WeatherRecord, name)
+        else getattr(WeatherFeatures, name)
+        for name in features
+    ]
+    joins = ()
+    if any(not hasattr(WeatherRecord, name) for name in features):
+        joins = ((WeatherFeatures, WeatherFeatures.weather_record_id == WeatherRecord.id),)
+    columns = [
+        WeatherRecord.id, WeatherRecord.timestamp,
+        WeatherRecord.latitude, WeatherRecord.longitude,
+        *feature_columns
+    ]
+    converters = {
+        "id": (np.int64, None),
+        "timestamp": ('datetime64[us]', None),
+        "latitude": (np.float64, None),
+        "longitude": (np.float64, None),
+        "features": (np.float64, len(features))
+    }
+    arrays = {}
+    _stream_into(db, WeatherRecord, columns, criteria, arrays, converters,
+                 chunk_size or CHUNK_SIZE, joins)
+    return arrays
+
+
+def load_feature_inputs(db: Session, *criteria, chunk_size: int = None) -> Dict[str, np.ndarray]:
+    """
+    Load the weather columns rolling aggregates are computed from as NumPy
+    arrays: "id", "timestamp" (datetime64[us]), "latitude", "longitude",
+    "wind_speed", "humidity", "rain_last_hour", and "materialized" (whether
+    the record already has a weather_features row).
+    """
+    columns = [
+        WeatherRecord.id, WeatherRecord.timestamp,
+        WeatherRecord.latitude, WeatherRecord.longitude,
+        WeatherRecord.wind_speed, WeatherRecord.humidity, WeatherRecord.rain_last_hour,
+        WeatherFeatures.id
+    ]
+    converters = {
+        "id": (np.int64, None),
+        "timestamp": ('datetime64[us]', None),
+        "latitude": (np.float64, None),
+        "longitude": (np.float64, None),
+        "wind_speed": (np.float64, None),
+        "humidity": (np.float64, None),
+        "rain_last_hour": (np.float64, None),
+        "feature_id": (np.float64, None)
+    }
+    arrays = {}
+    _stream_into(db, WeatherRecord, columns, criteria, arrays, converters, chunk_size or CHUNK_SIZE,
+                 ((WeatherFeatures, WeatherFeatures.weather_record_id == WeatherRecord.id),))
+    arrays["materialized"] = ~np.isnan(arrays.pop("feature_id"))
+    return arrays
+
+
+def load_outage_arrays(db: Session, *criteria, chunk_size: int = None) -> Dict[str, np.ndarray]:
+    """
+    Load network outages matching criteria as NumPy arrays.
+
+    Returns a dict with "id", "start_time" (datetime64[us]) and "school_id".
+    """
+    columns = [NetworkOutage.id, NetworkOutage.start_time, NetworkOutage.school_id]
+    converters = {
+        "id": (np.int64, None),
+        "start_time": ('datetime64[us]', None),
+        "school_id": (np.float64, None)
+    }
+    arrays = {}
+    _stream_into(db, NetworkOutage, columns, criteria, arrays, converters, chunk_size or CHUNK_SIZE)
+    return arrays
+
+
+def take_rows(arrays: Dict[str, np.ndarray], index) -> Dict[str, np.ndarray]:
+    """Select the same rows (mask or index array) from every array"""
+    return {name: values[index] for name, values in arrays.items()}
+
+
+def concat_rows(first: Dict[str, np.ndarray], second: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Stack two loads with the same keys row-wise"""
+    if not first:
+        return second
+    if not second:
+        return first
+    return {name: np.concatenate([first[name], second[name]]) for name in first}
@@ -0,0 +1,66 @@
+"""
+Inference latency benchmark: sklearn predict_proba vs the compiled NumPy forest.
+
+Usage:
+    python benchmarks/bench_inference.py [--repeats 200] [--train-rows 50000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Add the project root directory to Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.utils.forest import CompiledForest  # noqa: E402
+
+
+def synthetic_weather(n_rows: int, rng: np.random.Generator):
+    """Scaled weather-like features with a rain/wind driven outage label"""
+    X = rng.normal(size=(n_rows, 5))
+    logits = 1.5 * X[:, 2] + 2.0 * X[:, 3] + 0.5 * X[:, 1] - 2.0
+    y = (rng.random(n_rows) < 1 / (1 + np.exp(-logits))).astype(int)
+    return X, y
+
+
+def time_calls(fn, X, repeats: int) -> np.ndarray:
+    fn(X)  # warm up
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings[i] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--train-rows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    X_train, y_train = synthetic_weather(args.train_rows, rng)
+    model = RandomForestClassifier(n_estimators=100, random_state=42).fit(X_train, y_train)
+    compiled = CompiledForest.from_sklearn(model)
+
+    print(f"forest: {compiled.n_trees} trees, {len(compiled.feature)} nodes, max depth {compiled.depth}")
+    print(f"{'rows':>6} {'engine':>8} {'p50 ms':>10} {'p99 ms':>10} {'identical':>10}")
+
+    for n_rows in (1, 100, 10000):
+        X, _ = synthetic_weather(n_rows, rng)
+        identical = np.array_equal(model.predict_proba(X), compiled.predict_proba(X))
+        repeats = max(5, args.repeats // max(1, n_rows // 100))
+
+        for name, fn in (('sklearn', model.predict_proba), ('numpy', compiled.predict_proba)):
+            timings = time_calls(fn, X, repeats) * 1000
+            print(f"{n_rows:>6} {name:>8} {np.percentile(timings, 50):>10.3f} "
+                  f"{np.percentile(timings, 99):>10.3f} {str(identical):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+ML micro-benchmark suite: labeling, feature preparation, feature store backfill,
+fitting and inference.
+
+Runs each stage in a fresh process against a synthetic database (see
+synthetic_data.py) and reports throughput, latency percentiles and peak RSS
+growth. Results are compared with the stored baseline for the same row count
+in benchmarks/baseline.json; the run exits with status 1 when any metric is
+worse than the baseline by more than --tolerance.
+
+Usage:
+    python benchmarks/bench_ml.py [--rows 100000] [--db /tmp/bench_oracle.db] [--save-baseline]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the project root directory to Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from synthetic_data import generate  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+# Metric name suffix -> whether larger values are better
+HIGHER_IS_BETTER = {"rows_per_s": True, "ms": False, "mb": False}
+
+
+def percentiles(timings_s: np.ndarray, prefix: str) -> dict:
+    p50, p95, p99 = np.percentile(timings_s * 1000, [50, 95, 99])
+    return {f"{prefix}_p50_ms": p50, f"{prefix}_p95_ms": p95, f"{prefix}_p99_ms": p99}
+
+
+def time_calls(fn, repeats: int) -> np.ndarray:
+    fn()  # warm up
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - start
+    return timings
+
+
+def open_session(path: str):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    return sessionmaker(bind=create_engine(f"sqlite:///{path}"))()
+
+
+def sample_weather(db, n_rows: int) -> list:
+    """The newest n_rows weather records as the dicts the API scores"""
+    from app.models.database import WeatherRecord
+    from app.services.prediction_service import FEATURES
+
+    rows = db.query(WeatherRecord).order_by(WeatherRecord.id.desc()).limit(n_rows).all()
+    return [{name: getattr(row, name) for name in FEATURES} for row in rows]
+
+
+def stage_label(path: str, args) -> dict:
+    """Load column arrays and label them in both labeling modes"""
+    from app.services.prediction_service import FEATURES, PredictionService
+    from app.utils.training_data import load_weather_arrays, load_outage_arrays
+
+    db = open_session(path)
+    start = time.perf_counter()
+    weather = load_weather_arrays(db, FEATURES)
+    outages = load_outage_arrays(db)
+    load_s = time.perf_counter() - start
+    n_rows = len(weather["id"])
+
+    results = {"load_rows_per_s": n_rows / load_s}
+    for mode in ("global", "spatial"):
+        service = PredictionService(labeling_mode=mode)
+        start = time.perf_counter()
+        service.label_records(db, weather, outages)
+        results[f"label_{mode}_rows_per_s"] = n_rows / (time.perf_counter() - start)
+    return results
+
+
+def stage_features(path: str, args) -> dict:
+    """Turn weather dicts into feature matrices, one at a time and batched"""
+    from app.services.prediction_service import PredictionService
+
+    db = open_session(path)
+    weather = sample_weather(db, args.batch_size)
+    service = PredictionService()
+
+    single = time_calls(lambda: service.prepare_features(weather[0]), args.repeats)
+    batch = time_calls(lambda: service.prepare_features_batch(weather), max(5, args.repeats // 10))
+    return {
+        **percentiles(single, "prepare_single"),
+        "prepare_batch_rows_per_s": len(weather) / np.median(batch)
+    }
+
+
+def stage_backfill(path: str, args) -> dict:
+    """Materialize rolling aggregates for the whole history from scratch"""
+    from app.models.database import WeatherFeatures
+    from app.services.feature_store import FeatureStore
+
+    db = open_session(path)
+    db.query(WeatherFeatures).delete()
+    db.commit()
+    start = time.perf_counter()
+    n_rows = FeatureStore().backfill(db)
+    return {"backfill_rows_per_s": n_rows / (time.perf_counter() - start)}
+
+
+def stage_fit(path: str, args) -> dict:
+    """Full train_model run, storing the artifact for the predict stage"""
+    from app.services.prediction_service import PredictionService
+
+    db = open_session(path)
+    service = PredictionService()
+    start = time.perf_counter()
+    training_set = service.load_training_set(db)
+    load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    service.train_model(db, training_set=training_set)
+    fit_s = time.perf_counter() - start
+
+    n_rows = len(training_set["y"])
+    return {
+        "training_set_rows_per_s": n_rows / load_s,
+        "fit_rows_per_s": n_rows / fit_s
+    }
+
+
+def stage_predict(path: str, args) -> dict:
+    """predict_outage_risk latency and batch throughput with the fitted model"""
+    from app.services.prediction_service import PredictionService
+
+    db = open_session(path)
+    weather = sample_weather(db, args.batch_size)
+    service = PredictionService()
+    if not service.load_artifact():
+        raise RuntimeError("No model artifact; the fit stage must run first")
+
+    single = time_calls(lambda: service.predict_outage_risk(weather[0]), args.repeats)
+    batch = time_calls(lambda: service.predict_outage_risk_batch(weather), max(5, args.repeats // 10))
+    return {
+        **percentiles(single, "predict_single"),
+        "predict_batch_rows_per_s": len(weather) / np.median(batch)
+    }
+
+
+STAGES = {
+    "label": stage_label,
+    "features": stage_features,
+    "backfill": stage_backfill,
+    "fit": stage_fit,
+    "predict": stage_predict
+}
+
+
+def run_stage(name: str, path: str, args, model_dir: str, queue):
+    # Isolate artifacts and keep every call on the model, not the cache
+    os.environ["MODEL_DIR"] = model_dir
+    os.environ["PREDICTION_CACHE_SIZE"] = "0"
+
+    before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results = STAGES[name](path, args)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results[f"{name}_peak_mb"] = (peak_kb - before_kb) / 1024
+    queue.put({key: float(value) for key, value in results.items()})
+
+
+def is_regression(metric: str, value: float, baseline: float, tolerance: float) -> bool:
+    higher_is_better = next(
+        better for suffix, better in HIGHER_IS_BETTER.items() if metric.endswith(suffix)
+    )
+    if higher_is_better:
+        return value < baseline * (1 - tolerance)
+    return value > baseline * (1 + tolerance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--db', default='/tmp/bench_oracle.db')
+    parser.add_argument('--stages', default=','.join(STAGES))
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    generate(args.db, args.rows)
+
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as model_dir:
+        for name in args.stages.split(','):
+            queue = context.Queue()
+            process = context.Process(target=run_stage, args=(name, args.db, args, model_dir, queue))
+            process.start()
+            results.update(queue.get())
+            process.join()
+
+    baselines = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    baseline = baselines.get(str(args.rows), {})
+
+    regressions = []
+    print(f"{'metric':>32} {'value':>12} {'baseline':>12} {'change':>8}")
+    for metric, value in results.items():
+        line = f"{metric:>32} {value:>12.4g}"
+        if metric in baseline:
+            change = (value - baseline[metric]) / baseline[metric] if baseline[metric] else 0.0
+            line += f" {baseline[metric]:>12.4g} {change:>+8.1%}"
+            if is_regression(metric, value, baseline[metric], args.tolerance):
+                regressions.append(metric)
+                line += "  REGRESSION"
+        print(line)
+
+    if args.save_baseline:
+        baselines[str(args.rows)] = {**baseline, **{k: float(f"{v:.4g}") for k, v in results.items()}}
+        BASELINE_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"baseline for {args.rows} rows saved to {BASELINE_PATH}")
+    elif regressions:
+        print(f"{len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
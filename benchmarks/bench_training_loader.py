@@ -0,0 +1,124 @@
+"""
+Peak memory benchmark: ORM training-set loading vs streamed column arrays.
+
+Builds a synthetic weather_records table in a scratch SQLite file (reused on
+later runs) and loads it in a fresh process per loader so peak RSS is not
+shared between them.
+
+Usage:
+    python benchmarks/bench_training_loader.py [--rows 2000000] [--db /tmp/bench_weather.db]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the project root directory to Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+
+def build_database(path: str, n_rows: int, seed: int = 42):
+    """Create weather_records / network_outages with synthetic rows"""
+    from sqlalchemy import create_engine
+    from app.models import Base
+
+    if os.path.exists(path):
+        with sqlite3.connect(path) as conn:
+            if conn.execute("SELECT COUNT(*) FROM weather_records").fetchone()[0] == n_rows:
+                return
+        os.remove(path)
+
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2023-01-01T00:00:00')
+
+    with sqlite3.connect(path) as conn:
+        chunk = 200000
+        for offset in range(0, n_rows, chunk):
+            n = min(chunk, n_rows - offset)
+            times = start + (offset + np.arange(n)).astype('timedelta64[m]') * 10
+            rows = zip(
+                np.datetime_as_string(times, unit='us'),
+                rng.uniform(4, 14, n), rng.uniform(2, 15, n),
+                rng.normal(27, 4, n), rng.uniform(30, 100, n), rng.gamma(2, 2, n),
+                rng.exponential(1, n), rng.integers(0, 101, n).tolist()
+            )
+            conn.executemany(
+                "INSERT INTO weather_records (timestamp, latitude, longitude, temperature, "
+                "humidity, wind_speed, rain_last_hour, clouds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(t.replace('T', ' '), *values) for t, *values in rows]
+            )
+        outage_times = start + rng.integers(0, n_rows * 10, max(10, n_rows // 1000)).astype('timedelta64[m]')
+        conn.executemany(
+            "INSERT INTO network_outages (school_id, start_time, is_active) VALUES (?, ?, 1)",
+            [(int(rng.integers(1, 100)), str(t).replace('T', ' ')) for t in outage_times]
+        )
+
+
+def load_orm(db):
+    """The previous loader: full ORM objects, then row-by-row feature lists"""
+    from app.models.database import WeatherRecord, NetworkOutage
+
+    weather_records = db.query(WeatherRecord).all()
+    outages = db.query(NetworkOutage).all()
+    X = np.array([
+        [w.temperature, w.humidity, w.wind_speed, w.rain_last_hour, w.clouds]
+        for w in weather_records
+    ], dtype=float)
+    timestamps = [w.timestamp for w in weather_records]
+    return X.shape[0], len(timestamps) + len(outages)
+
+
+def load_arrays(db):
+    """Streamed, column-projected loader filling preallocated arrays"""
+    from app.services.prediction_service import FEATURES
+    from app.utils.training_data import load_weather_arrays, load_outage_arrays
+
+    weather = load_weather_arrays(db, FEATURES)
+    outages = load_outage_arrays(db)
+    return weather["features"].shape[0], len(weather["timestamp"]) + len(outages["id"])
+
+
+def run_loader(name: str, path: str, queue):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    db = sessionmaker(bind=create_engine(f"sqlite:///{path}"))()
+    loader = {"orm": load_orm, "arrays": load_arrays}[name]
+
+    before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    n_rows, _ = loader(db)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((name, n_rows, elapsed, before_kb / 1024, peak_kb / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2000000)
+    parser.add_argument('--db', default='/tmp/bench_weather.db')
+    args = parser.parse_args()
+
+    print(f"preparing {args.rows} weather rows in {args.db} ...")
+    build_database(args.db, args.rows)
+
+    context = multiprocessing.get_context('spawn')
+    print(f"{'loader':>8} {'rows':>10} {'seconds':>9} {'base MB':>9} {'peak MB':>9} {'delta MB':>9}")
+    for name in ("orm", "arrays"):
+        queue = context.Queue()
+        process = context.Process(target=run_loader, args=(name, args.db, queue))
+        process.start()
+        name, n_rows, elapsed, base_mb, peak_mb = queue.get()
+        process.join()
+        print(f"{name:>8} {n_rows:>10} {elapsed:>9.2f} {base_mb:>9.1f} {peak_mb:>9.1f} {peak_mb - base_mb:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Weather client benchmark: blocking requests.get vs the pooled async client,
+and the pooled client behind the geo-cell cache.
+
+Starts a local stub of the weather API that answers after a fixed delay,
+then fires N concurrent current-weather calls through each client and
+reports throughput, latency percentiles, the longest event loop stall
+(how long other routes would have been frozen) and how many requests
+reached the upstream API. The "cached" client spreads the N locations over
+--cells grid cells, as schools cluster in towns.
+
+Usage:
+    python benchmarks/bench_weather_client.py [--concurrency 100,200] [--delay-ms 50] [--cells 20]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import requests
+
+# Add the project root directory to Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+STUB_BODY = {
+    "main": {"temp": 27.5, "humidity": 80},
+    "wind": {"speed": 6.2},
+    "weather": [{"main": "Rain", "description": "light rain"}],
+    "rain": {"1h": 0.4},
+    "clouds": {"all": 75}
+}
+
+
+def start_stub_server(delay_s: float) -> str:
+    """Serve /weather from a uvicorn thread; returns the base URL"""
+    import uvicorn
+    from fastapi import FastAPI
+
+    stub = FastAPI()
+
+    @stub.get("/weather")
+    async def weather():
+        await asyncio.sleep(delay_s)
+        return STUB_BODY
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def blocking_get_current_weather(base_url: str, lat: float, lon: float):
+    """The previous implementation: a new connection per call and a blocking GET"""
+    response = requests.get(
+        f"{base_url}/weather",
+        params={"lat": lat, "lon": lon, "appid": "bench", "units": "metric"}
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Longest gap between scheduled wake-ups, i.e. the worst event loop stall"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+def locations(concurrency: int, cells: int, cell_deg: float, seed: int = 0) -> np.ndarray:
+    """One coordinate per request, scattered inside `cells` distinct grid cells"""
+    rng = np.random.default_rng(seed)
+    corners = np.column_stack([6.0 + np.arange(cells) * cell_deg * 3, np.full(cells, 3.0)])
+    offsets = rng.uniform(0.05, 0.95, size=(concurrency, 2)) * cell_deg
+    return corners[rng.integers(0, cells, concurrency)] + offsets
+
+
+async def run_client(name: str, base_url: str, concurrency: int, cells: int) -> dict:
+    from app.services.weather_service import WeatherService
+
+    service = WeatherService()
+    points = locations(concurrency, cells, service.cell_deg)
+
+    async def fetch(lat, lon):
+        if name == "blocking":
+            return await blocking_get_current_weather(base_url, lat, lon)
+        if name == "pooled":
+            return await service.fetch_current_weather(lat, lon)
+        return await service.get_current_weather(lat, lon)
+
+    async def timed(lat, lon):
+        start = time.perf_counter()
+        result = await fetch(lat, lon)
+        return time.perf_counter() - start, result is not None
+
+    # Warm up connections away from the measured cells
+    await service.fetch_current_weather(-45.0, -45.0)
+    upstream_before = service.upstream_calls
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed(lat, lon) for lat, lon in points))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    stall = await watcher
+    await service.aclose()
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    return {
+        "requests_per_s": concurrency / elapsed,
+        "p50_ms": np.percentile(latencies, 50),
+        "p99_ms": np.percentile(latencies, 99),
+        "max_stall_ms": stall * 1000,
+        "ok": sum(ok for _, ok in results),
+        "upstream": concurrency if name == "blocking" else service.upstream_calls - upstream_before
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', default='100,200')
+    parser.add_argument('--delay-ms', type=float, default=50)
+    parser.add_argument('--cells', type=int, default=20)
+    args = parser.parse_args()
+
+    base_url = start_stub_server(args.delay_ms / 1000)
+    os.environ["OPENWEATHER_BASE_URL"] = base_url
+    os.environ.setdefault("OPENWEATHER_API_KEY", "bench")
+    os.environ.setdefault("WEATHER_MAX_CONCURRENCY", "200")
+    os.environ.setdefault("WEATHER_RATE_PER_MINUTE", "0")
+    # Measure the in-process cache only, without entries left by earlier runs
+    os.environ.setdefault("WEATHER_DISK_CACHE", "")
+
+    print(f"stub at {base_url}, {args.delay_ms:.0f} ms upstream delay")
+    print(f"{'concurrency':>11} {'client':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'stall ms':>9} {'ok':>5} {'upstream':>9}")
+    for concurrency in map(int, args.concurrency.split(',')):
+        for name in ("blocking", "pooled", "cached"):
+            result = asyncio.run(run_client(name, base_url, concurrency, args.cells))
+            print(f"{concurrency:>11} {name:>9} {result['requests_per_s']:>9.1f} {result['p50_ms']:>9.1f} "
+                  f"{result['p99_ms']:>9.1f} {result['max_stall_ms']:>9.1f} {result['ok']:>5} {result['upstream']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Reproducible synthetic data for benchmarks: schools, weather_records and
+network_outages in a scratch SQLite file.
+
+Every school reports weather at a fixed interval over two years. A per-school storm signal
+(an AR(1) process) drives wind, rain, humidity and clouds, and outages are
+drawn at schools in proportion to how stormy their weather is, so labels are
+learnable and rare like the real data. The same seed and sizes always
+produce the same file; an existing file with matching sizes is reused.
+
+Usage:
+    python benchmarks/synthetic_data.py [--rows 100000] [--schools 0] [--outages 0] [--db /tmp/bench_oracle.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy.signal import lfilter
+
+# Add the project root directory to Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+START = np.datetime64('2023-01-01T00:00:00')
+SPAN_MINUTES = 2 * 365 * 24 * 60
+CHUNK_SIZE = 200000
+
+
+def default_sizes(n_weather: int, n_schools: int = 0, n_outages: int = 0):
+    """One school per 1000 weather rows (10 to 5000) and ten outages per school"""
+    n_schools = n_schools or int(np.clip(n_weather // 1000, 10, 5000))
+    n_outages = n_outages or 10 * n_schools
+    return n_schools, n_outages
+
+
+def _existing_sizes(path: str):
+    try:
+        with sqlite3.connect(path) as conn:
+            return tuple(
+                conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("schools", "weather_records", "network_outages")
+            )
+    except sqlite3.DatabaseError:
+        return None
+
+
+def sql_datetimes(times: np.ndarray) -> list:
+    """datetime64 values as the 'YYYY-MM-DD HH:MM:SS.ffffff' strings SQLAlchemy stores"""
+    return np.char.replace(np.datetime_as_string(times, unit='us'), 'T', ' ').tolist()
+
+
+def storm_signal(n_steps: int, rng: np.random.Generator, persistence: float = 0.97) -> np.ndarray:
+    """Unit-variance AR(1) storm intensity, one value per observation"""
+    noise = rng.normal(size=n_steps) * np.sqrt(1 - persistence ** 2)
+    return lfilter([1.0], [1.0, -persistence], noise)
+
+
+def generate(path: str, n_weather: int, n_schools: int = 0, n_outages: int = 0,
+             seed: int = 42, verbose: bool = True) -> dict:
+    """
+    Create (or reuse) a SQLite database at path with the given sizes.
+    Returns the actual sizes as a dict.
+    """
+    from sqlalchemy import create_engine
+    from app.models import Base
+
+    n_schools, n_outages = default_sizes(n_weather, n_schools, n_outages)
+    sizes = {"schools": n_schools, "weather_records": n_weather, "network_outages": n_outages}
+    if os.path.exists(path):
+        if _existing_sizes(path) == tuple(sizes.values()):
+            return sizes
+        os.remove(path)
+
+    Base.metadata.create_all(create_engine(f"sqlite:///{path}"))
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+
+        school_lats = rng.uniform(4, 14, n_schools)
+        school_lons = rng.uniform(2, 15, n_schools)
+        conn.executemany(
+            "INSERT INTO schools (id, name, latitude, longitude, contact_email, contact_phone) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (i + 1, f"School {i + 1}", float(lat), float(lon),
+                 f"school{i + 1}@example.com", f"+234{i + 1:09d}")
+                for i, (lat, lon) in enumerate(zip(school_lats, school_lons))
+            ]
+        )
+
+        # Split the rows evenly between schools; each school's observations
+        # form one evenly spaced time series over the whole span
+        per_school = np.full(n_schools, n_weather // n_schools)
+        per_school[:n_weather % n_schools] += 1
+        interval = max(1, SPAN_MINUTES // int(per_school.max()))
+
+        # Outage probability grows exponentially with storminess; calibrated
+        # per school so the expected total is n_outages
+        outage_rate = n_outages / n_weather
+        outage_rows = []
+
+        for school in range(n_schools):
+            steps = int(per_school[school])
+            storm = storm_signal(steps, rng)
+            times = START + np.arange(steps).astype('timedelta64[m]') * interval
+            wind = np.clip(4 + 3 * storm + rng.gamma(2, 1, steps), 0, None)
+            rain = np.where(storm > 0.8, rng.exponential(2 + 3 * storm.clip(0), steps), 0.0)
+            humidity = np.clip(70 + 12 * storm + rng.normal(0, 6, steps), 20, 100)
+            clouds = np.clip(50 + 30 * storm + rng.normal(0, 15, steps), 0, 100).astype(int)
+            temperature = 27 - 2 * storm + rng.normal(0, 2, steps)
+
+            for offset in range(0, steps, CHUNK_SIZE):
+                chunk = slice(offset, min(steps, offset + CHUNK_SIZE))
+                conn.executemany(
+                    "INSERT INTO weather_records (timestamp, latitude, longitude, temperature, "
+                    "humidity, wind_speed, rain_last_hour, clouds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    zip(
+                        sql_datetimes(times[chunk]),
+                        np.full(chunk.stop - chunk.start, school_lats[school]).tolist(),
+                        np.full(chunk.stop - chunk.start, school_lons[school]).tolist(),
+                        temperature[chunk].tolist(), humidity[chunk].tolist(),
+                        wind[chunk].tolist(), rain[chunk].tolist(), clouds[chunk].tolist()
+                    )
+                )
+
+            hazard = np.exp(1.5 * storm)
+            probability = np.clip(outage_rate * hazard / hazard.mean(), 0, 1)
+            hits = np.flatnonzero(rng.random(steps) < probability)
+            starts = times[hits] + rng.integers(0, 6 * 60, len(hits)).astype('timedelta64[m]')
+            outage_rows.extend((school + 1, t) for t in sql_datetimes(starts))
+
+        # Trim or top up to exactly n_outages so sizes are reproducible
+        order = rng.permutation(len(outage_rows))[:n_outages]
+        outage_rows = [outage_rows[i] for i in np.sort(order)]
+        while len(outage_rows) < n_outages:
+            school = int(rng.integers(0, n_schools))
+            minute = int(rng.integers(0, int(per_school[school]) * interval))
+            outage_rows.append((school + 1, sql_datetimes(START + np.timedelta64(minute, 'm'))))
+        outage_rows.sort(key=lambda row: row[1])
+        conn.executemany(
+            "INSERT INTO network_outages (school_id, start_time, end_time, is_active, cause) "
+            "VALUES (?, ?, NULL, 0, 'synthetic')",
+            outage_rows
+        )
+
+    if verbose:
+        print(f"generated {sizes} in {time.perf_counter() - started:.1f}s -> {path}")
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000, help="weather records (10k-10M)")
+    parser.add_argument('--schools', type=int, default=0, help="default: rows / 1000")
+    parser.add_argument('--outages', type=int, default=0, help="default: 10 per school")
+    parser.add_argument('--db', default='/tmp/bench_oracle.db')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    generate(args.db, args.rows, args.schools, args.outages, args.seed)
+
+
+if __name__ == '__main__':
+    main()
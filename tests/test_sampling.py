@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from app.utils.sampling import sample_training_rows
+
+
+def outage_history(n=200_000, rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    y = (rng.random(n) < rate).astype(np.int64)
+    timestamps = np.datetime64('2024-01-01') + np.arange(n).astype('timedelta64[m]')
+    return y, timestamps
+
+
+def weighted_positive_share(y, rows, weights):
+    return weights[y[rows] == 1].sum() / weights.sum()
+
+
+@pytest.mark.parametrize("strategies", [[], ['stratified'], ['decay'], ['cap'], ['stratified', 'decay']])
+def test_balanced_weighting_moves_positive_share_to_half(strategies):
+    y, timestamps = outage_history()
+    rows, weights, summary = sample_training_rows(
+        y, timestamps, strategies, max_rows=20_000, negative_ratio=10, seed=0
+    )
+    assert weighted_positive_share(y, rows, weights) == pytest.approx(0.5)
+    assert summary["weighted_positive_rate"] == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("strategies", [['stratified'], ['decay'], ['cap']])
+def test_history_weighting_keeps_source_rate(strategies):
+    y, timestamps = outage_history()
+    rows, weights, summary = sample_training_rows(
+        y, timestamps, strategies, max_rows=20_000, negative_ratio=10,
+        weighting='history', seed=0
+    )
+    assert summary["sampled_positive_rate"] > 2 * summary["source_positive_rate"]
+    assert weighted_positive_share(y, rows, weights) == pytest.approx(
+        summary["source_positive_rate"], rel=0.05
+    )
+
+
+def test_unknown_weighting_is_rejected():
+    y, timestamps = outage_history(n=100)
+    with pytest.raises(ValueError):
+        sample_training_rows(y, timestamps, [], weighting='inverse')